@@ -1,4 +1,6 @@
 # parenting-helper-webapp/agent_admin.py (debate 모드 UI 추가)
+import argparse
+import datetime
 import os
 import re
 import sys
@@ -10,12 +12,15 @@ webapp_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(webapp_root)
 
 # debate 모드 핸들러까지 import
+from lib import jobs, metrics
+from lib.prompt_manager import reload as reload_prompts
 from scripts.agent_i import handle_debate_mode, handle_debug_mode, handle_propose_mode
 
 # --- 유틸리티 함수 ---
 PROMPTS_DIR = os.path.join(webapp_root, "prompts")
 AVAILABLE_MODELS = [
     "gpt-4o-mini",
+    "claude-3-5-haiku",
     "claude-3-sonnet-20240229",
     "gemini-1.5-flash-latest",
     "deepseek-chat",
@@ -28,6 +33,42 @@ def get_persona_files():
     return [f for f in os.listdir(PROMPTS_DIR) if f.endswith((".yml", ".yaml"))]
 
 
+# --- 백그라운드 작업 (lib/jobs.py): 버튼은 작업 id만 받고 결과는 3번 섹션에서 확인 ---
+def _debug_job(params, emit):
+    return handle_debug_mode(
+        params["persona"],
+        params["input"],
+        params["output"],
+        params["model"],
+        fallback=False,
+    )
+
+
+def _debate_job(params, emit):
+    args = argparse.Namespace(
+        persona=params["persona"],
+        input=params["input"],
+        output=params["output"],
+        models=params["models"],
+        timeout=None,
+    )
+    # 단계 시작/모델별 리포트 이벤트를 도착하는 대로 작업 기록에 남긴다
+    return handle_debate_mode(args, on_event=lambda event: emit(**event))
+
+
+def _propose_job(params, emit):
+    content, path = handle_propose_mode(
+        params["goal"], params["target"], params["model"]
+    )
+    return {"content": content, "path": path}
+
+
+def submit_job(kind, params, fn):
+    job_id = jobs.submit(kind, params, fn)
+    st.session_state.job_id = job_id
+    st.toast(f"작업을 시작했습니다: {job_id}")
+
+
 # --- Streamlit UI 구성 ---
 st.set_page_config(layout="wide")
 st.title("🕵️ Agent_I: AI 페르소나 디버거 & 튜너")
@@ -42,6 +83,10 @@ with col_a:
         st.stop()
     selected_persona_file = st.selectbox("페르소나 선택", options=persona_files)
     selected_persona_path = os.path.join(PROMPTS_DIR, selected_persona_file)
+    # 페르소나 YAML을 직접 고친 뒤 캐시된 프롬프트를 즉시 다시 읽게 한다
+    if st.button("🔄 프롬프트 다시 읽기"):
+        reload_prompts()
+        st.success("프롬프트 파일을 다시 읽었습니다.")
 
 with col_b:
     # 이 부분은 나중에 debate 모드 UI에서 재사용됩니다.
@@ -65,15 +110,16 @@ if st.button("🕵️ 원인 진단 실행 (Debug)"):
     if not st.session_state.user_input or not st.session_state.bad_output:
         st.warning("사용자 입력과 실제 출력물을 모두 입력해주세요.")
     else:
-        with st.spinner(f"{selected_model}(이)가 실패 원인을 분석 중입니다..."):
-            report = handle_debug_mode(
-                selected_persona_path,
-                st.session_state.user_input,
-                st.session_state.bad_output,
-                selected_model,
-            )
-            st.session_state.diagnosis_report = report
-            st.session_state.debate_report = None  # 다른 리포트는 초기화
+        submit_job(
+            "debug",
+            {
+                "persona": selected_persona_path,
+                "input": st.session_state.user_input,
+                "output": st.session_state.bad_output,
+                "model": selected_model,
+            },
+            _debug_job,
+        )
 
 # --- 2b. 전문가 패널 토론 ---
 st.subheader("전문가 패널 토론")
@@ -94,37 +140,165 @@ if st.button("👨‍🏫 전문가 패널 토론 실행 (Debate)"):
     elif len(selected_debaters) < 2:
         st.warning("토론을 위해 최소 2개 이상의 모델을 선택해주세요.")
     else:
-        # debate 모드를 실행하기 위한 args 객체 시뮬레이션
-        class Args:
-            pass
-
-        args = Args()
-        args.persona = selected_persona_path
-        args.input = st.session_state.user_input
-        args.output = st.session_state.bad_output
-        args.models = selected_debaters
-
-        with st.spinner("전문가 패널이 토론을 시작합니다... (시간이 걸릴 수 있습니다)"):
-            # debate 핸들러는 직접 호출하지 않고, 결과물을 파일로 받거나 스트리밍하는 방식이 더 안정적일 수 있으나
-            # 현재 구조에서는 print를 리디렉션하여 결과를 가져오는 방식으로 구현합니다.
-            import contextlib
-            from io import StringIO
-
-            output_buffer = StringIO()
-            with contextlib.redirect_stdout(output_buffer):
-                handle_debate_mode(args)
-
-            debate_report = output_buffer.getvalue()
-            st.session_state.debate_report = debate_report
-            st.session_state.diagnosis_report = None  # 다른 리포트는 초기화
+        submit_job(
+            "debate",
+            {
+                "persona": selected_persona_path,
+                "input": st.session_state.user_input,
+                "output": st.session_state.bad_output,
+                "models": selected_debaters,
+            },
+            _debate_job,
+        )
+
+# --- 2c. 수정안 제안 ---
+st.subheader("페르소나 수정안 제안")
+goal = st.text_area("수정 목표 (Goal)", height=80, key="propose_goal")
+if st.button("✍️ 수정안 제안 실행 (Propose)"):
+    if not goal.strip():
+        st.warning("수정 목표를 입력해주세요.")
+    else:
+        submit_job(
+            "propose",
+            {"goal": goal, "target": selected_persona_path, "model": selected_model},
+            _propose_job,
+        )
 
 # --- 3. 진단/토론 결과 확인 ---
 st.header("3. 결과 확인")
-if st.session_state.get("diagnosis_report"):
-    st.subheader("단일 모델 진단 결과")
-    st.info(st.session_state.diagnosis_report)
-
-if st.session_state.get("debate_report"):
-    st.subheader("전문가 패널 토론 결과")
-    with st.expander("전체 토론 내용 보기", expanded=True):
-        st.markdown(st.session_state.debate_report)
+JOB_LABELS = {"debug": "진단", "debate": "토론", "propose": "수정안"}
+STATUS_LABELS = {
+    "queued": "⏳ 대기 중",
+    "running": "🏃 실행 중",
+    "done": "✅ 완료",
+    "error": "❌ 실패",
+    "interrupted": "⚠️ 중단됨 (서버 재시작)",
+}
+
+
+def _running_for(job):
+    """실행 중인 작업이 지금까지 걸린 초 (시작 전이면 None)"""
+    if not job["started_at"]:
+        return None
+    started = datetime.datetime.strptime(job["started_at"], "%Y-%m-%d %H:%M:%S")
+    return (datetime.datetime.now() - started).total_seconds()
+
+
+def render_debate(job, active):
+    """단계별로 모델마다 상태와 걸린 시간을 보여주고, 도착한 리포트부터 펼쳐 보여준다"""
+    events = job["events"]
+    reports = {(e["stage"], e["model"]): e for e in events if e.get("type") == "report"}
+    now = _running_for(job) if active else None
+    for stage in (e for e in events if e.get("type") == "stage"):
+        if stage["stage"] == "diagnosis":
+            st.markdown("##### 1단계: 개별 진단")
+        else:
+            st.markdown(f"##### 2단계: 교차 검증 (검토 대상: {stage['base_model']})")
+        for model in stage["models"]:
+            report = reports.get((stage["stage"], model))
+            if report is None:
+                waited = f" · {now - stage['elapsed']:.0f}초째" if now else ""
+                st.markdown(f"⏳ **{model}** 응답 대기 중{waited}")
+                continue
+            mark = "✅" if report["ok"] else "⚠️"
+            label = f"{mark} {model} ({report['seconds']}초)"
+            with st.expander(label, expanded=active):
+                st.markdown(report["text"])
+
+
+def render_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        st.caption("작업 정보를 찾을 수 없습니다.")
+        return
+    active = job["status"] in jobs.ACTIVE
+    status = STATUS_LABELS.get(job["status"], job["status"])
+    elapsed = f" · {job['elapsed']}초" if job.get("elapsed") is not None else ""
+    st.markdown(f"**{status}**{elapsed} · 시작 {job['created_at']}")
+    if job["error"]:
+        st.error(job["error"])
+
+    result = job["result"]
+    if job["kind"] == "debug" and result:
+        st.info(result)
+    elif job["kind"] == "propose" and result:
+        if result["path"]:
+            st.success(f"제안된 수정안이 '{result['path']}'에 저장되었습니다.")
+        st.code(result["content"], language="yaml")
+    elif job["kind"] == "debate":
+        render_debate(job, active)
+        if result:
+            with st.expander("전체 토론 내용 보기", expanded=True):
+                st.markdown(result["report"])
+    if active:
+        st.caption("진행 상황을 2초마다 새로 고칩니다.")
+    elif st.session_state.get("job_polling") == job_id:
+        # 폴링하던 작업이 끝났으면 전체 화면을 한 번 다시 그려 폴링을 멈춘다
+        st.session_state.job_polling = None
+        st.rerun(scope="app")
+
+
+recent_jobs = jobs.list_jobs()
+if recent_jobs:
+    job_ids = [j["id"] for j in recent_jobs]
+    current = st.session_state.get("job_id")
+    selected_job = st.selectbox(
+        "작업 선택 (모든 사용자의 최근 작업)",
+        options=job_ids,
+        index=job_ids.index(current) if current in job_ids else 0,
+        format_func=lambda i: next(
+            f"{j['id']} · {JOB_LABELS.get(j['kind'], j['kind'])}"
+            f" · {STATUS_LABELS.get(j['status'], j['status'])}"
+            for j in recent_jobs
+            if j["id"] == i
+        ),
+    )
+    st.session_state.job_id = selected_job
+    if next(j for j in recent_jobs if j["id"] == selected_job)["status"] in jobs.ACTIVE:
+        st.session_state.job_polling = selected_job
+        st.fragment(run_every=2)(render_job)(selected_job)
+    else:
+        render_job(selected_job)
+else:
+    st.caption("아직 실행한 작업이 없습니다.")
+
+# --- 4. LLM 호출 메트릭 ---
+st.header("4. LLM 호출 메트릭")
+# METRICS_TRACE_PATH를 설정하면 앱 등 다른 프로세스의 호출까지 트레이스 파일로 합산
+use_trace = bool(metrics.TRACE_PATH) and st.toggle(
+    "트레이스 파일 기준 (모든 프로세스)", value=True
+)
+metric_rows = metrics.trace_summary() if use_trace else metrics.summary()
+if metric_rows:
+    st.dataframe(
+        [
+            {
+                "프로바이더": r["provider"],
+                "모델": r["model"],
+                "요청": r["requests"],
+                "오류율": f"{r['error_rate']:.1%}",
+                "오류 분류": ", ".join(
+                    f"{k}={v}" for k, v in r["error_classes"].items()
+                ),
+                "재시도": r["retries"],
+                "캐시 히트": r["cache_hits"],
+                "p50 (ms)": r["p50_ms"],
+                "p95 (ms)": r["p95_ms"],
+                "TTFT p50 (ms)": r["ttft_p50_ms"],
+                "입력 토큰": r["prompt_tokens"],
+                "출력 토큰": r["completion_tokens"],
+                "캐시 입력 토큰": r["cached_tokens"],
+                "프롬프트 캐시율": (
+                    f"{r['prompt_cache_rate']:.1%}"
+                    if r["prompt_cache_rate"] is not None
+                    else "-"
+                ),
+            }
+            for r in metric_rows
+        ],
+        use_container_width=True,
+    )
+    with st.expander("Prometheus 형식 (이 프로세스)"):
+        st.code(metrics.prometheus_text(), language="text")
+else:
+    st.caption("아직 기록된 LLM 호출이 없습니다.")
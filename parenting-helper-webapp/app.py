@@ -1,26 +1,45 @@
+import os
+import uuid
 from datetime import datetime
 
 import streamlit as st
 
 # --- 내부 모듈 임포트 ---
-from lib.openai_client import chat_completion
+from lib import write_behind
+from lib.context_builder import build_context, llm_summarizer, message_tokens
 from lib.prompt_manager import get_prompts, get_system_prompt, select_prompt_id
+from lib.providers import StreamInterrupted, race_stream, stream_completion
 from lib.storage import (
     create_conversation,
     delete_conversation,
     export_conversation,
+    get_conversation_meta,
     list_conversations,
-    load_conversation,
     rename_conversation,
-    save_conversation,
+    search_conversations,
 )
+from lib.write_behind import load_conversation, save_conversation
+
+# 사용자 채팅에 쓰는 모델 (프로바이더는 lib/providers.py 에서 모델 이름으로 결정)
+CHAT_MODEL = "gpt-4o-mini"
+# 레이스 모드: 쉼표로 구분한 모델들에 동시에 보내고 먼저 제대로 답하기 시작한 쪽을 사용
+# (나머지는 취소, 비용은 최대 모델 수만큼). 비어 있으면 CHAT_MODEL 하나로 호출
+RACE_MODELS = [
+    m.strip() for m in os.environ.get("CHAT_RACE_MODELS", "").split(",") if m.strip()
+]
+# 1이면 토큰 예산 밖으로 밀려난 이전 턴을 누적 요약해 함께 보냄 (요약 호출 비용 발생)
+CONTEXT_SUMMARY = os.environ.get("CONTEXT_SUMMARY", "0") == "1"
+# 사이드바에 한 번에 보여줄 대화 수 ("더 보기"로 한 페이지씩 늘림)
+CONV_PAGE_SIZE = 20
+# 본문에 처음 보여줄 최근 메시지 수 ("이전 메시지 보기"로 이만큼씩 늘림)
+HISTORY_WINDOW = 20
 
 # =========================
 # Session bootstrap
 # =========================
 # 대화 ID / 메시지 초기화
 if "active_cid" not in st.session_state:
-    convs = list_conversations()
+    convs = list_conversations(limit=1)
     if convs:
         st.session_state.active_cid = convs[0]["id"]
         st.session_state.messages = load_conversation(st.session_state.active_cid)
@@ -50,13 +69,36 @@ def _safe_rerun():
 
 def add_message(role: str, content: str) -> str:
     ts = datetime.now().strftime("%Y-%m-%d %H:%M")
-    st.session_state.messages.append({"role": role, "content": content, "ts": ts})
+    msg = {"id": uuid.uuid4().hex[:12], "role": role, "content": content, "ts": ts}
+    message_tokens(msg, CHAT_MODEL)  # 토큰 수를 미리 세어 캐시에 둠
+    st.session_state.messages.append(msg)
+    # 파일/인덱스 쓰기는 백그라운드에서 (lib/write_behind.py)
     save_conversation(st.session_state.active_cid, st.session_state.messages)
     return ts
 
 
-def ua_only(msgs):
-    return [m for m in msgs if m.get("role") in ("user", "assistant")]
+def stream_markdown(chunks) -> str:
+    """텍스트 조각을 받는 즉시 화면에 이어 붙여 그리고, 완성된 전체 답변을 반환
+
+    답변 도중에 끊기면 오류는 화면에만 따로 표시하고, 받은 데까지만 반환합니다.
+    """
+    chunks = iter(chunks)
+    placeholder = st.empty()
+    parts = []
+    try:
+        with st.spinner("생각 중..."):
+            for delta in chunks:
+                parts.append(delta)
+                placeholder.markdown("".join(parts) + "▌")
+                break  # 첫 토큰이 도착하면 스피너를 닫는다
+        for delta in chunks:
+            parts.append(delta)
+            placeholder.markdown("".join(parts) + "▌")
+    except StreamInterrupted as e:
+        st.error(str(e))
+    answer = "".join(parts)
+    placeholder.markdown(answer)
+    return answer
 
 
 # =========================
@@ -90,11 +132,44 @@ with st.sidebar:
     st.divider()
     st.subheader("대화")
 
-    convs = list_conversations()
+    # 최근 페이지만 불러온다 (+1개는 "더 보기" 표시 여부 확인용)
+    shown = CONV_PAGE_SIZE * st.session_state.setdefault("conv_pages", 1)
+    convs = list_conversations(limit=shown + 1)
+    has_more = len(convs) > shown
+    convs = convs[:shown]
+    # 검색 등으로 연 오래된 대화도 선택 상자에 보이도록
+    if all(c["id"] != st.session_state.active_cid for c in convs):
+        active_meta = get_conversation_meta(st.session_state.active_cid)
+        if active_meta:
+            convs.insert(0, active_meta)
     options = {
         c["id"]: f'{c.get("title","새 대화")} · {c.get("updated_at","")}' for c in convs
     }
 
+    # ---- 전체 대화/아카이브 검색 ----
+    query = st.text_input(
+        "대화 검색", placeholder="예: 밤중 수유", key="search_query"
+    ).strip()
+    if query:
+        hits = search_conversations(query, limit=10)
+        if not hits:
+            st.caption("검색 결과가 없습니다.")
+        for i, hit in enumerate(hits):
+            label = "🙂" if hit["role"] == "user" else "🤖"
+            meta = get_conversation_meta(hit["cid"])
+            if meta:
+                title = meta.get("title", "새 대화")
+                if st.button(
+                    f"{title}\n\n{label} {hit['snippet']}",
+                    key=f"search_hit_{i}",
+                    use_container_width=True,
+                ):
+                    st.session_state.active_cid = hit["cid"]
+                    st.session_state.messages = load_conversation(hit["cid"])
+                    _safe_rerun()
+            else:
+                st.caption(f"📦 {hit['cid']}\n\n{label} {hit['snippet']}")
+
     if convs:
         try:
             default_idx = next(
@@ -103,18 +178,21 @@ with st.sidebar:
         except StopIteration:
             default_idx = 0
 
+        # key 없이 두어 index(=active_cid)가 바뀌면 새 위젯으로 선택도 따라가게 한다
         selected_cid = st.selectbox(
             "대화 선택",
             options=list(options.keys()),
             format_func=lambda cid: options[cid],
             index=default_idx,
             label_visibility="collapsed",
-            key="conv_selector",
         )
         if selected_cid != st.session_state.active_cid:
             st.session_state.active_cid = selected_cid
             st.session_state.messages = load_conversation(selected_cid)
             _safe_rerun()
+        if has_more and st.button("더 보기", use_container_width=True, key="btn_more"):
+            st.session_state.conv_pages += 1
+            _safe_rerun()
     else:
         st.caption("저장된 대화가 없습니다.")
 
@@ -137,6 +215,7 @@ with st.sidebar:
     r2c1, r2c2 = st.columns(2, gap="small")
     with r2c1:
         if st.button("내보내기", use_container_width=True, key="btn_export"):
+            write_behind.flush()  # 방금 나눈 메시지까지 내보내기
             out = export_conversation(st.session_state.active_cid)
             st.success(f"아카이브로 저장됨: {out}")
     with r2c2:
@@ -173,8 +252,11 @@ with st.sidebar:
             yes = dc1.form_submit_button("삭제")
             no = dc2.form_submit_button("취소", type="secondary")
             if yes:
+                # 밀린 저장이 삭제 뒤에 대화를 되살리지 않도록 취소하고 기다린다
+                write_behind.discard(st.session_state.active_cid)
+                write_behind.flush()
                 delete_conversation(st.session_state.active_cid)
-                left = list_conversations()
+                left = list_conversations(limit=1)
                 if left:
                     st.session_state.active_cid = left[0]["id"]
                     st.session_state.messages = load_conversation(left[0]["id"])
@@ -191,19 +273,50 @@ with st.sidebar:
 # =========================
 st.title("육아 도우미")
 
-# 과거 메시지 렌더링
-for m in st.session_state.get("messages", []):
-    if m.get("role") not in ("user", "assistant"):
-        continue  # system 등은 표시 안 함
-    role = "user" if m["role"] == "user" else "assistant"
-    with st.chat_message(role):
-        st.markdown(m.get("content", ""))
-        if m["role"] == "user" and m.get("ts"):
-            st.caption(m["ts"])
-
-# 입력/응답
-prompt = st.chat_input("예) 15주차, 밤중수유 간격과 낮잠 패턴이 궁금해요")
-if prompt:
+
+def render_message(m: dict, key: str) -> None:
+    with st.container(key=key):
+        with st.chat_message(m["role"]):
+            st.markdown(m.get("content", ""))
+            if m["role"] == "user" and m.get("ts"):
+                st.caption(m["ts"])
+
+
+# 과거 메시지 렌더링: 최근 HISTORY_WINDOW개만 그리고, 나머지는 요청할 때 페이지 단위로.
+# fragment 안에 있어 "이전 메시지 보기"는 히스토리 영역만 다시 실행한다.
+# 전체 실행 때 정한 history_upto까지만 그리고, 그 뒤에 쌓인 턴은 render_chat이 그린다.
+@st.fragment
+def render_history():
+    upto = st.session_state.history_upto
+    visible = [
+        (i, m)
+        for i, m in enumerate(st.session_state.get("messages", [])[:upto])
+        if m.get("role") in ("user", "assistant")  # system 등은 표시 안 함
+    ]
+    window_key = f"history_shown_{st.session_state.active_cid}"
+    shown = st.session_state.setdefault(window_key, HISTORY_WINDOW)
+    hidden = len(visible) - shown
+    if hidden > 0 and st.button(
+        f"이전 메시지 보기 ({hidden}개)", key="btn_history_more"
+    ):
+        shown = st.session_state[window_key] = shown + HISTORY_WINDOW
+
+    for i, m in visible[-shown:]:
+        # 예전에 저장된 메시지는 id가 없어 위치로 대신한다
+        render_message(m, f"msg_{m.get('id') or i}")
+
+
+# 입력/응답: chat_input이 fragment 안에 있어 메시지를 보내면 이 영역만 다시 실행된다.
+# (히스토리는 다시 그리지 않고, 이번 전체 실행 뒤에 쌓인 턴만 여기서 그린다)
+@st.fragment
+def render_chat():
+    for m in st.session_state.messages[st.session_state.history_upto :]:
+        if m.get("role") in ("user", "assistant"):
+            render_message(m, f"msg_{m['id']}")
+
+    prompt = st.chat_input("예) 15주차, 밤중수유 간격과 낮잠 패턴이 궁금해요")
+    if not prompt:
+        return
     user_text = f"[아기 {age_months}개월]\n{prompt}"
     ts = add_message("user", user_text)
     with st.chat_message("user"):
@@ -227,10 +340,28 @@ if prompt:
     st.session_state["router_prompt_id"] = chosen_id  # 동점 시 이전 선택 유지용
     system_msg = get_system_prompt(chosen_id)
 
-    messages_for_api = [system_msg] + ua_only(st.session_state.messages[-12:])
+    # 모델별 토큰 예산 안에서 최근 턴부터 채움 (선택: 이전 턴은 누적 요약)
+    summary_cache = None
+    if CONTEXT_SUMMARY:
+        summary_cache = st.session_state.setdefault("summary_cache", {})
+        summary_cache = summary_cache.setdefault(st.session_state.active_cid, {})
+    messages_for_api = build_context(
+        system_msg,
+        st.session_state.messages,
+        model=CHAT_MODEL,
+        summarize=llm_summarizer(CHAT_MODEL) if CONTEXT_SUMMARY else None,
+        summary_cache=summary_cache,
+    )
 
     with st.chat_message("assistant"):
-        with st.spinner("생각 중..."):
-            answer = chat_completion(messages_for_api)
-        st.markdown(answer)
+        if len(RACE_MODELS) > 1:
+            chunks = race_stream(RACE_MODELS, messages_for_api)
+        else:
+            chunks = stream_completion(CHAT_MODEL, messages_for_api)
+        answer = stream_markdown(chunks)
     add_message("assistant", answer)
+
+
+st.session_state.history_upto = len(st.session_state.messages)
+render_history()
+render_chat()
@@ -1,35 +1,148 @@
 # lib/anthropic_client.py
+# 프롬프트 캐시: 페르소나 system 블록과 마지막 사용자 메시지에 cache_control 중단점을 둬서,
+# 다음 턴에는 "페르소나 + 이전 턴까지"가 캐시에서 읽힙니다. (모델별 최소 길이 미만이면
+# API가 조용히 캐시하지 않음) 캐시에서 읽은 입력 토큰은 cached_tokens로 보고합니다.
 import os
+from typing import Dict, Iterator
 
-import anthropic
+from lib.providers import (
+    ProviderNotReady,
+    error_text,
+    lazy_async_client,
+    lazy_client,
+)
 
-try:
-    client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-except Exception as e:
-    print(f" Anthropic 클라이언트 초기화 실패: {e}")
-    client = None
+MODEL = "claude-3-5-haiku-20241022"  # 범용 채팅 모델
+MAX_TOKENS = 4096
+NAME = "Anthropic"
+_EPHEMERAL = {"type": "ephemeral"}
+_NOT_READY = "오류: Anthropic 클라이언트가 초기화되지 않았습니다. API 키를 확인하세요."
 
 
+def _client():
+    """첫 호출 시 SDK를 import 하고 클라이언트를 만듭니다.
+
+    Anthropic SDK는 버전에 따라 다른 HTTP 라이브러리를 쓰므로 공유 풀 대신 SDK 자체 풀을
+    쓰고, 클라이언트 객체를 재사용해 keep-alive 연결을 유지합니다.
+    """
+
+    def factory():
+        import anthropic
+
+        # 재시도는 lib/resilience.py 가 맡으므로 SDK 자체 재시도는 끈다
+        return anthropic.Anthropic(
+            api_key=os.environ.get("ANTHROPIC_API_KEY"), max_retries=0
+        )
+
+    return lazy_client("Anthropic", factory)
+
+
+def _async_client():
+    def factory():
+        import anthropic
+
+        return anthropic.AsyncAnthropic(
+            api_key=os.environ.get("ANTHROPIC_API_KEY"), max_retries=0
+        )
+
+    return lazy_async_client("Anthropic", factory)
+
+
+def _split_system(messages: list) -> tuple[list, list]:
+    """OpenAI 형식 messages를 (system 블록, 대화)로 나누고 캐시 중단점을 붙입니다.
+
+    앞쪽 system 메시지들 중 첫 번째(페르소나)에 중단점을 두고, 요약 등 나머지는 그 뒤에
+    이어 붙입니다. 대화는 마지막 사용자 메시지에 중단점을 둡니다.
+    """
+    system = []
+    i = 0
+    while i < len(messages) and messages[i]["role"] == "system":
+        if messages[i]["content"]:
+            system.append({"type": "text", "text": messages[i]["content"]})
+        i += 1
+    if system:
+        system[0]["cache_control"] = _EPHEMERAL
+
+    turns = [dict(m) for m in messages[i:]]
+    for m in reversed(turns):
+        if m["role"] == "user" and isinstance(m["content"], str):
+            m["content"] = [
+                {"type": "text", "text": m["content"], "cache_control": _EPHEMERAL}
+            ]
+            break
+    return system, turns
+
+
+def _request(messages: list) -> Dict:
+    system, turns = _split_system(messages)
+    kwargs = {"model": MODEL, "max_tokens": MAX_TOKENS, "messages": turns}
+    if system:
+        kwargs["system"] = system
+    return kwargs
+
+
+def _usage(usage) -> Dict:
+    # input_tokens는 캐시에서 읽거나 새로 쓴 부분을 뺀 값이라 다른 프로바이더처럼 합친다
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+    return {
+        "prompt_tokens": usage.input_tokens + cache_read + cache_write,
+        "completion_tokens": usage.output_tokens,
+        "cached_tokens": cache_read,
+    }
+
+
+# === 예외를 그대로 올리는 호출 (lib/providers.py 가 계측/재시도에 사용) ===
+def complete(messages: list) -> Dict:
+    """{"text", "prompt_tokens", "completion_tokens", "cached_tokens"}. 실패 시 예외."""
+    client = _client()
+    if not client:
+        raise ProviderNotReady(_NOT_READY)
+    message = client.messages.create(**_request(messages))
+    return dict(_usage(message.usage), text=message.content[0].text)
+
+
+async def acomplete(messages: list) -> Dict:
+    client = _async_client()
+    if not client:
+        raise ProviderNotReady(_NOT_READY)
+    message = await client.messages.create(**_request(messages))
+    return dict(_usage(message.usage), text=message.content[0].text)
+
+
+def stream(messages: list, usage: Dict | None = None) -> Iterator[str]:
+    """텍스트 조각(delta)을 순서대로 내보내고, 끝나면 usage dict에 토큰 수를 채웁니다."""
+    client = _client()
+    if not client:
+        raise ProviderNotReady(_NOT_READY)
+    with client.messages.stream(**_request(messages)) as response:
+        for text in response.text_stream:
+            if text:
+                yield text
+        if usage is not None:
+            usage.update(_usage(response.get_final_message().usage))
+
+
+# === 오류를 "오류: ..." 문자열로 돌려주는 기존 인터페이스 ===
 def get_completion(messages: list) -> str:
     """Anthropic Claude API를 호출하여 응답을 반환합니다."""
-    if not client:
-        return (
-            "오류: Anthropic 클라이언트가 초기화되지 않았습니다. API 키를 확인하세요."
-        )
+    try:
+        return complete(messages)["text"]
+    except Exception as e:
+        return error_text(NAME, e)
 
-    system_prompt = ""
-    user_messages = messages
-    if messages and messages[0]["role"] == "system":
-        system_prompt = messages[0]["content"]
-        user_messages = messages[1:]
 
+async def aget_completion(messages: list) -> str:
+    """get_completion의 비동기 버전"""
     try:
-        message = client.messages.create(
-            model="claude-3-5-haiku-20241022",  # 범용 채팅 모델
-            max_tokens=4096,
-            system=system_prompt,
-            messages=user_messages,
-        )
-        return message.content[0].text
+        return (await acomplete(messages))["text"]
+    except Exception as e:
+        return error_text(NAME, e)
+
+
+def stream_completion(messages: list) -> Iterator[str]:
+    """Anthropic Claude API 응답을 스트리밍으로 받아 텍스트 조각(delta)을 순서대로 반환합니다."""
+    try:
+        yield from stream(messages)
     except Exception as e:
-        return f"오류: Anthropic API 호출 중 문제가 발생했습니다: {e}"
+        yield error_text(NAME, e)
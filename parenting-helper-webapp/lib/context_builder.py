@@ -0,0 +1,152 @@
+# lib/context_builder.py
+# 토큰 예산 기반 컨텍스트 구성.
+# 최근 턴부터 거꾸로 모델별 토큰 예산이 찰 때까지 담고, (선택) 예산 밖으로 밀려난
+# 이전 턴은 누적 요약(rolling summary) 한 덩어리로 system 프롬프트 뒤에 붙입니다.
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+try:  # 선택 의존성: 있으면 정확한 토큰 수, 없으면 보수적인 근사치
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# 모델별 컨텍스트 예산(토큰). 응답 길이를 고려해 모델 한도보다 훨씬 작게 잡는다.
+MODEL_BUDGETS = {
+    "gpt-4o-mini": 6000,
+    "claude-3-5-haiku": 6000,
+    "gemini-1.5-flash": 6000,
+    "deepseek-chat": 6000,
+}
+DEFAULT_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 4000))
+# 요약은 밀려난 메시지가 이만큼 쌓일 때마다 한 번씩만 갱신 (매 턴 요약 호출 방지)
+SUMMARY_BATCH = 6
+MESSAGE_OVERHEAD = 4  # role 등 메시지당 부가 토큰
+TOKEN_CACHE_ENTRIES = 8192
+
+_encoders: Dict[str, object] = {}
+# (카운터, 메시지 id, 내용 해시) -> 토큰 수. 메시지 dict는 저장/내보내기되므로 건드리지 않는다
+_token_cache: "OrderedDict[tuple, int]" = OrderedDict()
+_token_lock = threading.Lock()
+
+
+def _encoding_name(model: str) -> str:
+    return "o200k_base" if "4o" in model else "cl100k_base"
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    if tiktoken is not None:
+        name = _encoding_name(model)
+        if name not in _encoders:
+            _encoders[name] = tiktoken.get_encoding(name)
+        return len(_encoders[name].encode(text))
+    # 근사치: UTF-8 3바이트 ≈ 1토큰 (한글 1글자 ≈ 1토큰, 영어는 다소 과대 추정)
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def _counter_name(model: str) -> str:
+    return _encoding_name(model) if tiktoken is not None else "approx"
+
+
+def message_tokens(m: Dict, model: str = "gpt-4o-mini") -> int:
+    """메시지의 토큰 수. 한 번 센 값은 (카운터, id, 내용 해시)별로 메모리에 캐시합니다."""
+    content = m.get("content", "")
+    digest = hashlib.sha1(content.encode("utf-8")).hexdigest()
+    key = (_counter_name(model), m.get("id"), digest)
+    with _token_lock:
+        if key in _token_cache:
+            _token_cache.move_to_end(key)
+            return _token_cache[key]
+    tokens = count_tokens(content, model) + MESSAGE_OVERHEAD
+    with _token_lock:
+        _token_cache[key] = tokens
+        while len(_token_cache) > TOKEN_CACHE_ENTRIES:
+            _token_cache.popitem(last=False)
+    return tokens
+
+
+def budget_for(model: str) -> int:
+    for prefix, budget in MODEL_BUDGETS.items():
+        if model.startswith(prefix):
+            return budget
+    return DEFAULT_BUDGET
+
+
+def build_context(
+    system_msg: Dict,
+    messages: List[Dict],
+    model: str = "gpt-4o-mini",
+    budget: int | None = None,
+    summarize: Callable[[str, List[Dict]], str] | None = None,
+    summary_cache: Dict | None = None,
+) -> List[Dict]:
+    """API로 보낼 [system, (요약 system), ...최근 턴] 목록을 만듭니다.
+
+    summarize(이전 요약, 새로 밀려난 메시지들) -> 새 요약 을 넘기면 예산 밖 턴을 요약으로
+    보존하고, 결과는 summary_cache({"upto": 요약한 메시지 수, "text": 요약})에 재사용합니다.
+    """
+    budget = budget or budget_for(model)
+    convo = [m for m in messages if m.get("role") in ("user", "assistant")]
+
+    summary = ""
+    if summarize is not None and summary_cache is not None:
+        summary = summary_cache.get("text", "")
+    remaining = budget - message_tokens(system_msg, model)
+    if summary:
+        remaining -= count_tokens(summary, model)
+
+    # 최근 메시지부터 예산이 허락하는 만큼 (마지막 메시지는 항상 포함)
+    start = len(convo)
+    for i in range(len(convo) - 1, -1, -1):
+        cost = message_tokens(convo[i], model)
+        if cost > remaining and i < len(convo) - 1:
+            break
+        remaining -= cost
+        start = i
+    # 대화는 user 메시지로 시작해야 하는 프로바이더가 있어 앞쪽 assistant는 잘라낸다
+    while start < len(convo) - 1 and convo[start]["role"] != "user":
+        start += 1
+
+    if summarize is not None and summary_cache is not None:
+        upto = summary_cache.get("upto", 0)
+        if start - upto >= SUMMARY_BATCH:
+            summary = summarize(summary, convo[upto:start])
+            summary_cache.update(upto=start, text=summary)
+
+    # 페르소나 프롬프트는 매 턴 바이트 단위로 같은 접두부로 두고(프로바이더 프롬프트 캐시),
+    # 자주 바뀌는 요약은 그 뒤의 별도 system 메시지로 보낸다
+    context = [{"role": "system", "content": system_msg.get("content", "")}]
+    if summary:
+        context.append({"role": "system", "content": f"# 이전 대화 요약\n{summary}"})
+    return context + [
+        {"role": m["role"], "content": m.get("content", "")} for m in convo[start:]
+    ]
+
+
+def llm_summarizer(model: str = "gpt-4o-mini") -> Callable[[str, List[Dict]], str]:
+    """providers로 요약을 만드는 기본 summarize 함수"""
+    from lib.providers import get_completion
+
+    def summarize(previous: str, new_messages: List[Dict]) -> str:
+        transcript = "\n".join(
+            f"{'사용자' if m['role'] == 'user' else '도우미'}: {m.get('content', '')}"
+            for m in new_messages
+        )
+        prompt = [
+            {
+                "role": "system",
+                "content": "육아 상담 대화의 요약을 갱신한다. 아기 개월 수, 증상, 이미 안내한 "
+                "내용, 부모의 상황처럼 이후 답변에 필요한 사실만 한국어 5줄 이내로 남겨라.",
+            },
+            {
+                "role": "user",
+                "content": f"[기존 요약]\n{previous or '(없음)'}\n\n[새 대화]\n{transcript}",
+            },
+        ]
+        result = get_completion(model, prompt)
+        # 요약 실패 시 기존 요약을 유지
+        return previous if result.startswith("오류:") else result
+
+    return summarize
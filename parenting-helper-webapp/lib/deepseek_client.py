@@ -1,26 +1,124 @@
 # lib/deepseek_client.py
+# DeepSeek은 같은 접두부를 디스크 캐시로 자동 재사용합니다. 히트한 입력 토큰은
+# prompt_cache_hit_tokens로 오므로 cached_tokens로 보고합니다.
 import os
+from typing import Dict, Iterator
 
-from openai import OpenAI
+from lib.providers import (
+    ProviderNotReady,
+    error_text,
+    lazy_async_client,
+    lazy_client,
+    shared_async_http_client,
+    shared_http_client,
+)
 
-try:
-    client = OpenAI(
-        api_key=os.environ.get("DEEPSEEK_API_KEY"), base_url="https://api.deepseek.com"
+MODEL = "deepseek-chat"  # 범용 채팅 모델
+BASE_URL = "https://api.deepseek.com"
+NAME = "DeepSeek"
+_NOT_READY = "오류: DeepSeek 클라이언트가 초기화되지 않았습니다. API 키를 확인하세요."
+
+
+def _client():
+    """첫 호출 시 SDK를 import 하고 공유 연결 풀을 쓰는 클라이언트를 만듭니다."""
+
+    def factory():
+        from openai import OpenAI
+
+        return OpenAI(
+            api_key=os.environ.get("DEEPSEEK_API_KEY"),
+            base_url=BASE_URL,
+            http_client=shared_http_client(),
+            max_retries=0,  # 재시도는 lib/resilience.py 가 맡는다
+        )
+
+    return lazy_client("DeepSeek", factory)
+
+
+def _async_client():
+    def factory():
+        from openai import AsyncOpenAI
+
+        return AsyncOpenAI(
+            api_key=os.environ.get("DEEPSEEK_API_KEY"),
+            base_url=BASE_URL,
+            http_client=shared_async_http_client(),
+            max_retries=0,
+        )
+
+    return lazy_async_client("DeepSeek", factory)
+
+
+def _usage(usage) -> Dict:
+    if usage is None:
+        return {"prompt_tokens": None, "completion_tokens": None}
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "cached_tokens": getattr(usage, "prompt_cache_hit_tokens", None),
+    }
+
+
+# === 예외를 그대로 올리는 호출 (lib/providers.py 가 계측/재시도에 사용) ===
+def complete(messages: list) -> Dict:
+    """{"text", "prompt_tokens", "completion_tokens", "cached_tokens"}. 실패 시 예외."""
+    client = _client()
+    if not client:
+        raise ProviderNotReady(_NOT_READY)
+    response = client.chat.completions.create(model=MODEL, messages=messages)
+    return dict(_usage(response.usage), text=response.choices[0].message.content)
+
+
+async def acomplete(messages: list) -> Dict:
+    client = _async_client()
+    if not client:
+        raise ProviderNotReady(_NOT_READY)
+    response = await client.chat.completions.create(model=MODEL, messages=messages)
+    return dict(_usage(response.usage), text=response.choices[0].message.content)
+
+
+def stream(messages: list, usage: Dict | None = None) -> Iterator[str]:
+    """텍스트 조각(delta)을 순서대로 내보내고, 끝나면 usage dict에 토큰 수를 채웁니다."""
+    client = _client()
+    if not client:
+        raise ProviderNotReady(_NOT_READY)
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
     )
-except Exception as e:
-    print(f" DeepSeek 클라이언트 초기화 실패: {e}")
-    client = None
+    try:
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if chunk.usage is not None and usage is not None:
+                usage.update(_usage(chunk.usage))
+    finally:
+        # 도중에 닫혀도(레이스 취소 등) HTTP 응답을 바로 정리 (1.0부터 있는 Stream.response)
+        response.response.close()
 
 
+# === 오류를 "오류: ..." 문자열로 돌려주는 기존 인터페이스 ===
 def get_completion(messages: list) -> str:
     """DeepSeek API를 호출하여 응답을 반환합니다."""
-    if not client:
-        return "오류: DeepSeek 클라이언트가 초기화되지 않았습니다. API 키를 확인하세요."
+    try:
+        return complete(messages)["text"]
+    except Exception as e:
+        return error_text(NAME, e)
 
+
+async def aget_completion(messages: list) -> str:
+    """get_completion의 비동기 버전"""
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat", messages=messages  # 범용 채팅 모델
-        )
-        return response.choices[0].message.content
+        return (await acomplete(messages))["text"]
+    except Exception as e:
+        return error_text(NAME, e)
+
+
+def stream_completion(messages: list) -> Iterator[str]:
+    """DeepSeek API 응답을 스트리밍으로 받아 텍스트 조각(delta)을 순서대로 반환합니다."""
+    try:
+        yield from stream(messages)
     except Exception as e:
-        return f"오류: DeepSeek API 호출 중 문제가 발생했습니다: {e}"
+        yield error_text(NAME, e)
@@ -0,0 +1,189 @@
+# lib/export.py
+# 대화 내보내기 (두 저장소 백엔드 공용).
+# - 메시지를 한 건씩 흘려 쓰므로 대화 길이/대화 수와 무관하게 메모리 사용이 일정합니다.
+# - 파일 이름은 chat-YYYYMMDD-HHMMSS-<임의 8자리>.<확장자>. 쓰는 동안은 .part 파일을
+#   배타적으로 만들어 쓰고 끝나면 이름을 바꾸므로, 같은 초에 여러 번 내보내도 겹치지 않고
+#   반쯤 쓰인 파일이 아카이브 목록에 보이지도 않습니다.
+# - export_conversations(): 전체 또는 조건에 맞는 대화를 한 번에 (야간 스냅샷 등)
+#     jsonl / jsonl.gz : 대화마다 {"conversation": 메타} 한 줄 뒤에
+#                        메시지마다 {"conversation_id": id, "message": 메시지} 한 줄
+#     tar.gz           : 대화별 conversations/<id>.jsonl + 마지막에 manifest.jsonl
+import contextlib
+import datetime
+import gzip
+import io
+import json
+import os
+import tarfile
+import tempfile
+import textwrap
+import time
+import uuid
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+EXPORT_DIR = os.path.join(DATA_DIR, "exports")
+FORMATS = ("jsonl", "jsonl.gz", "tar.gz")
+SPOOL_BYTES = 1 << 20  # tar 멤버 하나를 메모리에 모으는 한도 (넘으면 임시 파일)
+
+
+@contextlib.contextmanager
+def _output(export_dir: str, ext: str, prefix: str = "chat") -> Iterator[Tuple]:
+    """겹치지 않는 새 경로를 잡아 (경로, 바이너리 파일)을 넘기고, 성공하면 확정합니다."""
+    os.makedirs(export_dir, exist_ok=True)
+    ts = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    while True:
+        path = os.path.join(export_dir, f"{prefix}-{ts}-{uuid.uuid4().hex[:8]}.{ext}")
+        if os.path.exists(path):
+            continue
+        try:
+            fd = os.open(f"{path}.part", os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            continue
+        break
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield path, f
+    except BaseException:
+        os.remove(f"{path}.part")
+        raise
+    os.replace(f"{path}.part", path)
+
+
+def _text(f: IO[bytes]) -> io.TextIOWrapper:
+    # 바깥 파일은 호출한 쪽이 닫으므로 detach로 넘겨준다
+    return io.TextIOWrapper(f, encoding="utf-8", newline="\n", write_through=False)
+
+
+def _json_array(f: IO[str], messages: Iterable[Dict]) -> Iterator[Dict]:
+    """write_json_array와 같게 쓰면서, 쓴 메시지를 하나씩 넘겨줍니다."""
+    n = 0
+    f.write("[")
+    for m in messages:
+        f.write(",\n" if n else "\n")
+        f.write(textwrap.indent(json.dumps(m, ensure_ascii=False, indent=2), "  "))
+        n += 1
+        yield m
+    f.write("\n]" if n else "]")
+
+
+def write_json_array(f: IO[str], messages: Iterable[Dict]) -> int:
+    """json.dump(messages, indent=2)와 같은 모양으로 한 건씩 씁니다. 쓴 메시지 수 반환"""
+    return sum(1 for _ in _json_array(f, messages))
+
+
+def export_messages(
+    messages: Iterable[Dict],
+    export_dir: str,
+    index: Callable[[str, Iterable[Dict]], Any] | None = None,
+) -> str:
+    """대화 하나를 아카이브 JSON 파일로 내보내고 경로를 반환합니다.
+
+    index(경로, 메시지)를 주면 쓰는 메시지를 그대로 흘려 보내 같은 순회에서 색인합니다.
+    """
+    with _output(export_dir, "json") as (path, f):
+        out = _text(f)
+        written = _json_array(out, messages)
+        if index is not None:
+            index(path, written)
+        for _ in written:  # 색인이 도중에 멈췄어도 파일은 끝까지 쓴다
+            pass
+        out.flush()
+        out.detach()
+    return path
+
+
+def _matches(meta: Dict, since, until, title, cids) -> bool:
+    if cids is not None and meta["id"] not in cids:
+        return False
+    if since and meta.get("updated_at", "") < since:
+        return False
+    if until and meta.get("updated_at", "") >= until:
+        return False
+    if title and title.lower() not in meta.get("title", "").lower():
+        return False
+    return True
+
+
+def _select(storage, since, until, title, cids) -> List[str]:
+    """조건에 맞는 대화 id 목록 (메시지는 읽지 않고 메타데이터만).
+
+    목록은 한 번에 읽는다: updated_at 순서로 offset 페이지를 넘기면 내보내는 사이에
+    수정된 대화 때문에 대화가 빠지거나 두 번 들어갈 수 있다.
+    """
+    cids = set(cids) if cids else None
+    conversations = storage.list_conversations()
+    return [c["id"] for c in conversations if _matches(c, since, until, title, cids)]
+
+
+def _jsonl_lines(storage, cid: str, meta: Dict) -> Iterator[str]:
+    yield json.dumps({"conversation": meta}, ensure_ascii=False) + "\n"
+    for m in storage.iter_messages(cid):
+        row = {"conversation_id": cid, "message": m}
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def _add_spool(tar: tarfile.TarFile, name: str, spool: IO[bytes]) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = spool.tell()
+    info.mtime = int(time.time())
+    spool.seek(0)
+    tar.addfile(info, spool)
+
+
+def _add_member(tar: tarfile.TarFile, name: str, lines: Iterable[str]) -> None:
+    # tar 헤더에 크기가 먼저 들어가야 해서 멤버 하나만 모았다가 쓴다
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as spool:
+        for line in lines:
+            spool.write(line.encode("utf-8"))
+        _add_spool(tar, name, spool)
+
+
+def export_conversations(
+    fmt: str = "tar.gz",
+    export_dir: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    title: str | None = None,
+    cids: Iterable[str] | None = None,
+) -> Tuple[str, int]:
+    """전체(또는 조건에 맞는) 대화를 파일 하나로 내보내고 (경로, 대화 수)를 반환합니다.
+
+    since/until: updated_at 기준 "YYYY-MM-DD HH:MM:SS" 이상/미만
+    title: 제목에 포함된 문자열, cids: 대화 id 목록
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"지원하지 않는 형식: {fmt} (가능: {', '.join(FORMATS)})")
+    from lib import storage
+
+    export_dir = export_dir or EXPORT_DIR
+    selected = _select(storage, since, until, title, cids)
+
+    def metas() -> Iterator[Dict]:
+        for cid in selected:
+            meta = storage.get_conversation_meta(cid)
+            if meta is not None:  # 내보내는 사이에 삭제된 대화
+                yield meta
+
+    count = 0
+    with _output(export_dir, fmt, prefix="conversations") as (path, f):
+        if fmt == "tar.gz":
+            manifest = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+            with manifest, tarfile.open(fileobj=f, mode="w:gz") as tar:
+                for meta in metas():
+                    lines = _jsonl_lines(storage, meta["id"], meta)
+                    manifest.write(next(lines).encode("utf-8"))  # 메타 줄은 manifest로
+                    _add_member(tar, f"conversations/{meta['id']}.jsonl", lines)
+                    count += 1
+                _add_spool(tar, "manifest.jsonl", manifest)
+        else:
+            raw = gzip.GzipFile(fileobj=f, mode="wb") if fmt == "jsonl.gz" else f
+            out = _text(raw)
+            for meta in metas():
+                out.writelines(_jsonl_lines(storage, meta["id"], meta))
+                count += 1
+            out.flush()
+            out.detach()
+            if raw is not f:
+                raw.close()
+    return path, count
@@ -0,0 +1,72 @@
+# lib/fake_client.py
+# 오프라인용 가짜 프로바이더. API 키/네트워크 없이 eval 등 도구를 돌려볼 때 씁니다.
+# 같은 입력에는 항상 같은 답을 돌려주며(결정적), FAKE_LLM_LATENCY(초)로 지연을 흉내 냅니다.
+import asyncio
+import hashlib
+import os
+import time
+from typing import Dict, Iterator
+
+MODEL = "fake"
+NAME = "Fake"
+LATENCY = float(os.environ.get("FAKE_LLM_LATENCY", 0))
+
+
+def _answer(messages: list) -> str:
+    last = next(
+        (m.get("content", "") for m in reversed(messages) if m.get("role") == "user"),
+        "",
+    )
+    digest = hashlib.sha1(
+        "\n".join(m.get("content", "") for m in messages).encode("utf-8")
+    ).hexdigest()[:8]
+    return f"[fake:{digest}] {last[:60]}"
+
+
+def _result(messages: list) -> Dict:
+    text = _answer(messages)
+    prompt = sum(len(m.get("content", "")) for m in messages)
+    # 토큰 수는 대략 2글자 = 1토큰으로 흉내
+    return {
+        "text": text,
+        "prompt_tokens": prompt // 2 + 1,
+        "completion_tokens": len(text) // 2 + 1,
+    }
+
+
+def complete(messages: list) -> Dict:
+    if LATENCY:
+        time.sleep(LATENCY)
+    return _result(messages)
+
+
+async def acomplete(messages: list) -> Dict:
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    return _result(messages)
+
+
+def stream(messages: list, usage: Dict | None = None) -> Iterator[str]:
+    if LATENCY:
+        time.sleep(LATENCY)
+    result = _result(messages)
+    words = result["text"].split(" ")
+    for i, word in enumerate(words):
+        yield word if i == len(words) - 1 else word + " "
+    if usage is not None:
+        usage.update(
+            prompt_tokens=result["prompt_tokens"],
+            completion_tokens=result["completion_tokens"],
+        )
+
+
+def get_completion(messages: list) -> str:
+    return complete(messages)["text"]
+
+
+async def aget_completion(messages: list) -> str:
+    return (await acomplete(messages))["text"]
+
+
+def stream_completion(messages: list) -> Iterator[str]:
+    yield from stream(messages)
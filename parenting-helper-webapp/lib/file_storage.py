@@ -0,0 +1,379 @@
+# lib/file_storage.py (파일 백엔드: 대화별 JSONL 로그 + index.json)
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import threading
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from lib import export, search_index
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+CONV_DIR = os.path.join(DATA_DIR, "conversations")
+INDEX_PATH = os.path.join(CONV_DIR, "index.json")
+os.makedirs(CONV_DIR, exist_ok=True)
+
+# 대화 저장 형식: "jsonl"(기본, 메시지 1건 = 1줄 append) | "json"(기존 전체 재작성)
+STORAGE_FORMAT = os.environ.get("STORAGE_FORMAT", "jsonl").lower()
+
+# cid -> (저장된 메시지 수, 마지막 메시지 해시, 로그 파일 크기)
+# 같은 프로세스에서 이어 쓰기가 가능한지 판단하는 용도이며, 파일 크기가 다르면 다시 읽는다.
+_log_state: Dict[str, Tuple[int, str, int]] = {}
+
+# index.json 캐시: 파일의 (inode, mtime_ns, size)가 같으면 다시 파싱하지 않는다.
+_index_lock = threading.RLock()
+_index_cache: Dict = {"key": None, "idx": None, "list": None}
+# batch_index_updates() 안에서는 세션(스레드)별로 변경분을 모았다가 한 번에 쓴다.
+_batch = threading.local()
+
+
+def _now_iso():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _conv_path(cid: str) -> str:
+    return os.path.join(CONV_DIR, f"{cid}.json")
+
+
+def _log_path(cid: str) -> str:
+    return os.path.join(CONV_DIR, f"{cid}.jsonl")
+
+
+def _msg_hash(m: Dict) -> str:
+    raw = json.dumps(m, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _scan_log(path: str, status: Dict | None = None) -> Iterator[Dict]:
+    """JSONL 로그를 한 건씩 읽습니다. 끊긴 줄(비정상 종료) 이후는 버리고,
+    status를 주면 끝까지 읽었을 때 status["clean"]에 손상 여부를 남깁니다."""
+    clean = True
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                clean = False
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                m = json.loads(line)
+            except json.JSONDecodeError:
+                clean = False
+                break
+            yield m
+    if status is not None:
+        status["clean"] = clean
+
+
+def _read_log(path: str) -> List[Dict]:
+    return list(_scan_log(path))
+
+
+def _remember(cid: str, messages: List[Dict]) -> None:
+    path = _log_path(cid)
+    last = _msg_hash(messages[-1]) if messages else ""
+    _log_state[cid] = (len(messages), last, os.path.getsize(path))
+
+
+def _append_log(cid: str, new_msgs: List[Dict]) -> None:
+    """새 메시지만 한 줄씩 이어 쓰고 fsync 합니다."""
+    with open(_log_path(cid), "a", encoding="utf-8") as f:
+        for m in new_msgs:
+            f.write(json.dumps(m, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _compact_log(cid: str, messages: List[Dict]) -> None:
+    """전체 메시지로 로그를 새로 써서 교체(임시 파일 + os.replace)합니다."""
+    path = _log_path(cid)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for m in messages:
+            f.write(json.dumps(m, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    # 기존 형식 파일은 로그로 옮겨졌으므로 정리
+    if os.path.exists(_conv_path(cid)):
+        os.remove(_conv_path(cid))
+
+
+def _write_log(cid: str, messages: List[Dict]) -> None:
+    """가능하면 append, 기존 기록과 어긋나면(편집/삭제/구형식) 지연 압축(compaction)"""
+    path = _log_path(cid)
+    state = _log_state.get(cid)
+    if state is None or not os.path.exists(path) or os.path.getsize(path) != state[2]:
+        # 다른 세션이 썼거나 처음 보는 대화: 디스크 기준으로 상태를 다시 잡는다
+        state = (0, "", 0)
+        if os.path.exists(path):
+            status: Dict = {}
+            persisted = list(_scan_log(path, status))
+            _remember(cid, persisted)
+            state = _log_state[cid]
+            if not status["clean"]:
+                state = (-1, "", 0)  # 손상된 꼬리 → append 대신 압축
+
+    count, last, _ = state
+    can_append = (
+        os.path.exists(path)
+        and not os.path.exists(_conv_path(cid))
+        and 0 <= count <= len(messages)
+        and (count == 0 or _msg_hash(messages[count - 1]) == last)
+    )
+    if can_append:
+        if len(messages) > count:
+            _append_log(cid, messages[count:])
+    else:
+        _compact_log(cid, messages)
+    _remember(cid, messages)
+
+
+def compact_conversation(cid: str) -> None:
+    """로그 끝의 손상된 줄 제거 및 구형식(.json) 파일을 JSONL 로그로 정리"""
+    messages = load_conversation(cid)
+    _compact_log(cid, messages)
+    _remember(cid, messages)
+
+
+def _index_key() -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(INDEX_PATH)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _load_index() -> Dict:
+    pending = getattr(_batch, "idx", None)
+    if pending is not None:
+        return pending
+
+    with _index_lock:
+        key = _index_key()
+        if key is not None and key == _index_cache["key"]:
+            return _index_cache["idx"]
+
+        idx = {"order": [], "conversations": {}}
+        if key is not None:
+            try:
+                with open(INDEX_PATH, "r", encoding="utf-8") as f:
+                    idx = json.load(f)
+            except json.JSONDecodeError:
+                pass
+        _index_cache.update(key=key, idx=idx, list=None)
+        return idx
+
+
+def _edit_index() -> Dict:
+    """수정용 인덱스. 캐시된 dict는 다른 스레드도 읽으므로 얕은 복사본을 주고,
+    _save_index가 성공했을 때만 캐시가 바뀝니다. (메타 dict는 고치지 말고 새로 넣을 것)"""
+    pending = getattr(_batch, "idx", None)
+    if pending is not None:
+        return pending  # 이 스레드의 배치에서 이미 만든 복사본
+    idx = _load_index()
+    return dict(
+        idx,
+        order=list(idx.get("order", [])),
+        conversations=dict(idx.get("conversations", {})),
+    )
+
+
+def _save_index(idx: Dict) -> None:
+    if getattr(_batch, "depth", 0) > 0:
+        _batch.idx = idx  # batch 종료 시 한 번만 기록
+        with _index_lock:
+            _index_cache["list"] = None
+        return
+
+    with _index_lock:
+        tmp = f"{INDEX_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(idx, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, INDEX_PATH)
+        _index_cache.update(key=_index_key(), idx=idx, list=None)
+
+
+@contextlib.contextmanager
+def batch_index_updates() -> Iterator[None]:
+    """블록 안의 인덱스 변경을 모아 블록이 끝날 때 index.json을 한 번만 씁니다.
+
+    예) 한 번의 채팅 턴(사용자 메시지 저장 + 답변 저장)을 감싸서 인덱스 쓰기를 1회로 줄임
+    """
+    _batch.depth = getattr(_batch, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _batch.depth -= 1
+        if _batch.depth == 0:
+            idx, _batch.idx = getattr(_batch, "idx", None), None
+            if idx is not None:
+                _save_index(idx)
+
+
+def _sorted_conversations() -> List[Dict]:
+    """인덱스의 대화 메타 목록(updated_at 최신순). 인덱스가 바뀔 때만 다시 만듭니다."""
+    idx = _load_index()
+    cacheable = idx is _index_cache["idx"] and getattr(_batch, "idx", None) is None
+    if cacheable and _index_cache["list"] is not None:
+        return _index_cache["list"]
+    res = []
+    for cid in reversed(idx.get("order", [])):
+        meta = idx["conversations"].get(cid, {})
+        res.append(
+            {
+                "id": cid,
+                "title": meta.get("title", "새 대화"),
+                "updated_at": meta.get("updated_at", ""),
+                "last_preview": meta.get("last_preview", ""),
+            }
+        )
+    # 안정 정렬이므로 updated_at이 같으면 나중에 만든 대화가 앞
+    res.sort(key=lambda c: c["updated_at"], reverse=True)
+    if cacheable:
+        _index_cache["list"] = res
+    return res
+
+
+def list_conversations(
+    offset: int = 0, limit: int | None = None, before_updated_at: str | None = None
+) -> List[Dict]:
+    """최근 수정 순 대화 목록. limit/offset 또는 before_updated_at(이 시각보다 이전)으로
+    한 페이지만 가져올 수 있습니다."""
+    with _index_lock:
+        res = _sorted_conversations()
+        start = 0
+        if before_updated_at is not None:
+            start = next(
+                (i for i, c in enumerate(res) if c["updated_at"] < before_updated_at),
+                len(res),
+            )
+        start += offset
+        end = len(res) if limit is None else start + limit
+        return [dict(c) for c in res[start:end]]
+
+
+def get_conversation_meta(cid: str) -> Optional[Dict]:
+    """대화 하나의 메타데이터(id/title/updated_at/last_preview). 없으면 None"""
+    with _index_lock:
+        meta = _load_index()["conversations"].get(cid)
+        if meta is None:
+            return None
+        return {
+            "id": cid,
+            "title": meta.get("title", "새 대화"),
+            "updated_at": meta.get("updated_at", ""),
+            "last_preview": meta.get("last_preview", ""),
+        }
+
+
+def create_conversation(title: str = "새 대화") -> str:
+    cid = uuid.uuid4().hex[:12]
+    messages: List[Dict] = []  # <<-- 시스템 메시지 제거
+    if STORAGE_FORMAT == "jsonl":
+        _compact_log(cid, messages)
+        _remember(cid, messages)
+    else:
+        with open(_conv_path(cid), "w", encoding="utf-8") as f:
+            json.dump(messages, f, ensure_ascii=False, indent=2)
+    with _index_lock:
+        idx = _edit_index()
+        idx["conversations"][cid] = {
+            "title": title,
+            "updated_at": _now_iso(),
+            "last_preview": "",
+        }
+        idx["order"].append(cid)  # cid는 새로 만든 값이라 중복 없음
+        _save_index(idx)
+    return cid
+
+
+def load_conversation(cid: str) -> List[Dict]:
+    # 구형식(.json)이 남아 있으면 아직 압축되지 않은 것이므로 그쪽이 최신
+    if os.path.exists(_conv_path(cid)):
+        with open(_conv_path(cid), "r", encoding="utf-8") as f:
+            return json.load(f)
+    if os.path.exists(_log_path(cid)):
+        return _read_log(_log_path(cid))
+    return []
+
+
+def iter_messages(cid: str) -> Iterator[Dict]:
+    """메시지를 한 건씩 (JSONL 로그는 파일 전체를 메모리에 올리지 않음)"""
+    if os.path.exists(_conv_path(cid)):
+        yield from load_conversation(cid)
+        return
+    try:
+        yield from _scan_log(_log_path(cid))
+    except FileNotFoundError:
+        return
+
+
+def save_conversation(cid: str, messages: List[Dict]) -> None:
+    if STORAGE_FORMAT == "jsonl":
+        _write_log(cid, messages)
+    else:
+        with open(_conv_path(cid), "w", encoding="utf-8") as f:
+            json.dump(messages, f, ensure_ascii=False, indent=2)
+
+    preview = ""
+    for m in reversed(messages):
+        if m.get("role") == "user":
+            preview = m.get("content", "").replace("\n", " ")[:80]
+            break
+    with _index_lock:
+        idx = _edit_index()
+        idx["conversations"][cid] = dict(
+            idx["conversations"].get(cid) or {"title": "새 대화"},
+            updated_at=_now_iso(),
+            last_preview=preview,
+        )
+        _save_index(idx)
+    search_index.update_conversation(cid, messages)
+
+
+# === 추가: 회의/대화 메타 편집/삭제/내보내기 유틸 ===
+def rename_conversation(cid: str, new_title: str) -> bool:
+    with _index_lock:
+        idx = _edit_index()
+        if cid not in idx["conversations"]:
+            return False
+        idx["conversations"][cid] = dict(
+            idx["conversations"][cid], title=new_title, updated_at=_now_iso()
+        )
+        _save_index(idx)
+    return True
+
+
+def delete_conversation(cid: str) -> bool:
+    """대화를 파일/인덱스에서 삭제"""
+    for path in (_conv_path(cid), _log_path(cid)):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
+    _log_state.pop(cid, None)
+    search_index.remove_conversation(cid)
+
+    with _index_lock:
+        idx = _edit_index()
+        if cid in idx["conversations"]:
+            idx["conversations"].pop(cid, None)
+            if cid in idx["order"]:
+                idx["order"].remove(cid)
+            _save_index(idx)
+    return True
+
+
+def export_conversation(cid: str, export_dir: str | None = None) -> str:
+    """data/archive/chat-YYYYMMDD-HHMMSS-xxxxxxxx.json 형태로 내보내기 (lib/export.py)"""
+    # 파일에 쓰는 메시지를 그대로 색인에도 넘겨 대화는 한 번만 읽는다
+    return export.export_messages(
+        iter_messages(cid),
+        export_dir or os.path.join(DATA_DIR, "archive"),
+        index=search_index.index_archive,
+    )
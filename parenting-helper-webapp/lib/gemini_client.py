@@ -1,52 +1,256 @@
 # lib/gemini_client.py
+# Gemini 어댑터.
+# - 시스템 프롬프트는 모델의 system_instruction으로 넘기고, 페르소나(시스템 프롬프트 내용)별
+#   모델 객체를 LRU로 캐시합니다.
+# - 대화 세션(ChatSession)은 "지금까지의 히스토리" 해시로 LRU 캐시해, 다음 턴이 같은 히스토리로
+#   이어지면 세션을 그대로 쓰고 새 사용자 메시지만 덧붙입니다. (히스토리를 매번 변환/재구성하지
+#   않음. 히스토리가 잘리거나 요약되어 달라지면 새 세션)
+# - Gemini API는 상태가 없어 요청에는 히스토리가 함께 실립니다. 매 턴 다시 과금되는 입력을
+#   줄이려면 GEMINI_CONTEXT_CACHE=1: 긴 페르소나 프롬프트를 명시적 컨텍스트 캐시
+#   (CachedContent)로 만들어 두고 그 위에서 대화합니다. 캐시된 토큰은 cached_tokens로 보고.
+#   (모델/프롬프트 길이가 캐시 최소 조건을 못 맞추면 자동으로 system_instruction만 사용)
+import collections
+import hashlib
+import json
 import os
+import threading
+import time
+from typing import Dict, Iterator
 
-import google.generativeai as genai
+from lib import metrics
+from lib.providers import ProviderNotReady, error_text, lazy_client
 
-try:
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY 환경 변수가 설정되지 않았습니다.")
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("gemini-1.5-flash")  # 범용 채팅 모델
-except Exception as e:
-    print(f" Gemini 클라이언트 초기화 실패: {e}")
-    model = None
+MODEL = "gemini-1.5-flash"  # 범용 채팅 모델
+NAME = "Gemini"
+_NOT_READY = "오류: Gemini 클라이언트가 초기화되지 않았습니다. API 키를 확인하세요."
 
+SESSION_CACHE_SIZE = int(os.environ.get("GEMINI_SESSION_CACHE", 256))
+PERSONA_CACHE_SIZE = 16
+CONTEXT_CACHE = os.environ.get("GEMINI_CONTEXT_CACHE", "0") == "1"
+CONTEXT_CACHE_TTL = int(os.environ.get("GEMINI_CONTEXT_CACHE_TTL", 3600))  # 초
 
+_lock = threading.Lock()
+# 시스템 프롬프트 해시 -> (GenerativeModel, 컨텍스트 캐시 만료 시각 또는 None)
+_models: "collections.OrderedDict[str, tuple]" = collections.OrderedDict()
+# 시스템 프롬프트 해시 -> 모델 생성 잠금 (같은 페르소나의 컨텍스트 캐시를 한 번만 만듦)
+_model_locks: Dict[str, threading.Lock] = {}
+# 시스템 프롬프트 해시 -> 컨텍스트 캐시를 만들 수 없었던 이유 (다시 시도하지 않음)
+_cache_failed: Dict[str, str] = {}
+# 히스토리 해시 -> ChatSession (사용 중에는 꺼내 두어 동시에 같은 세션을 쓰지 않음)
+_sessions: "collections.OrderedDict[str, object]" = collections.OrderedDict()
+
+
+def _genai():
+    """첫 호출 시 SDK를 import 하고 API 키를 설정합니다. (gRPC 채널은 SDK가 재사용)"""
+
+    def factory():
+        import google.generativeai as genai
+
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY 환경 변수가 설정되지 않았습니다.")
+        genai.configure(api_key=api_key)
+        return genai
+
+    return lazy_client("Gemini", factory)
+
+
+def _digest(*parts) -> str:
+    raw = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _create_model(genai, system: str, key: str) -> tuple:
+    if not system:
+        return genai.GenerativeModel(MODEL), None
+    if CONTEXT_CACHE and key not in _cache_failed:
+        try:
+            cached = genai.caching.CachedContent.create(
+                model=MODEL,
+                display_name=f"persona-{key[:12]}",
+                system_instruction=system,
+                ttl=CONTEXT_CACHE_TTL,
+            )
+            # 만료 직전에 쓰다 실패하지 않도록 1분 일찍 다시 만든다
+            expires = time.monotonic() + CONTEXT_CACHE_TTL - 60
+            return genai.GenerativeModel.from_cached_content(cached), expires
+        except Exception as e:
+            _cache_failed[key] = str(e)
+            print(f" Gemini 컨텍스트 캐시 생성 실패, system_instruction만 사용: {e}")
+    return genai.GenerativeModel(MODEL, system_instruction=system), None
+
+
+def _model_for(system: str):
+    """시스템 프롬프트(페르소나)별 모델. 컨텍스트 캐시는 TTL이 지나면 다시 만든다."""
+    genai = _genai()
+    if not genai:
+        raise ProviderNotReady(_NOT_READY)
+    key = _digest(MODEL, system)
+
+    def cached():
+        with _lock:
+            entry = _models.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                _models.move_to_end(key)
+                return entry[0]
+            return None
+
+    model = cached()
+    if model is not None:
+        return key, model
+    with _lock:
+        create_lock = _model_locks.setdefault(key, threading.Lock())
+    # 원격 캐시 생성은 느리므로 _lock 밖, 페르소나별 잠금 안에서. 먼저 만든 쪽이 있으면
+    # 그것을 쓴다 (동시에 처음 호출돼도 컨텍스트 캐시가 하나만 생기고 버려지지 않음)
+    with create_lock:
+        model = cached()
+        if model is not None:
+            return key, model
+        entry = _create_model(genai, system, key)
+        with _lock:
+            _models[key] = entry
+            while len(_models) > PERSONA_CACHE_SIZE:
+                _models.popitem(last=False)
+    return key, entry[0]
+
+
+def _expire_model(key: str, error: Exception) -> None:
+    """컨텍스트 캐시가 먼저 삭제되어 요청이 거부되면 다음 호출에서 다시 만든다."""
+    with _lock:
+        entry = _models.get(key)
+        if entry and entry[1] is not None and metrics.classify_error(error) == "client":
+            _models.pop(key, None)
+
+
+def _to_gemini(messages: list) -> tuple[str, list, str]:
+    """OpenAI/Anthropic 형식의 messages를 (시스템 프롬프트, 히스토리, 마지막 프롬프트)로
+
+    system_instruction에는 첫 system 메시지(페르소나)만 넣어 모델/컨텍스트 캐시 키가 대화
+    요약 때문에 바뀌지 않게 하고, 나머지 system 메시지는 첫 사용자 파트 앞에 붙입니다.
+    """
+    systems = [m["content"] for m in messages if m["role"] == "system"]
+    system, extra = (systems[0], systems[1:]) if systems else ("", [])
+    turns = [
+        {
+            "role": "user" if m["role"] == "user" else "model",
+            "parts": [m["content"]],
+        }
+        for m in messages
+        if m["role"] != "system"
+    ]
+    # 마지막 메시지는 프롬프트로 사용하므로 히스토리에서 제거
+    prompt = ""
+    if turns and turns[-1]["role"] == "user":
+        prompt = turns.pop()["parts"][0]
+    if extra:
+        if turns:
+            turns[0]["parts"] = extra + turns[0]["parts"]
+        else:
+            prompt = "\n\n".join(extra + [prompt])
+    return system, turns, prompt
+
+
+def _history_key(model_key: str, turns: list) -> str:
+    return _digest(model_key, [(t["role"], *t["parts"]) for t in turns])
+
+
+def _checkout(messages: list):
+    """(세션, 모델 키, 히스토리, 프롬프트). 같은 히스토리의 세션이 있으면 꺼내 쓴다."""
+    system, turns, prompt = _to_gemini(messages)
+    model_key, model = _model_for(system)
+    with _lock:
+        session = _sessions.pop(_history_key(model_key, turns), None)
+    if session is None:
+        session = model.start_chat(history=turns)
+    return session, model_key, turns, prompt
+
+
+def _checkin(session, model_key: str, turns: list, prompt: str, answer: str) -> None:
+    """답변까지 끝난 세션을 다음 턴의 히스토리 해시로 돌려놓는다."""
+    turns = turns + [
+        {"role": "user", "parts": [prompt]},
+        {"role": "model", "parts": [answer]},
+    ]
+    with _lock:
+        _sessions[_history_key(model_key, turns)] = session
+        while len(_sessions) > SESSION_CACHE_SIZE:
+            _sessions.popitem(last=False)
+
+
+def _usage(response) -> Dict:
+    meta = getattr(response, "usage_metadata", None)
+    return {
+        "prompt_tokens": getattr(meta, "prompt_token_count", None),
+        "completion_tokens": getattr(meta, "candidates_token_count", None),
+        "cached_tokens": getattr(meta, "cached_content_token_count", None),
+    }
+
+
+# === 예외를 그대로 올리는 호출 (lib/providers.py 가 계측/재시도에 사용) ===
+def complete(messages: list) -> Dict:
+    """{"text", "prompt_tokens", "completion_tokens", "cached_tokens"}. 실패 시 예외."""
+    session, model_key, turns, prompt = _checkout(messages)
+    try:
+        response = session.send_message(prompt)
+    except Exception as e:
+        _expire_model(model_key, e)
+        raise
+    _checkin(session, model_key, turns, prompt, response.text)
+    return dict(_usage(response), text=response.text)
+
+
+async def acomplete(messages: list) -> Dict:
+    session, model_key, turns, prompt = _checkout(messages)
+    try:
+        response = await session.send_message_async(prompt)
+    except Exception as e:
+        _expire_model(model_key, e)
+        raise
+    _checkin(session, model_key, turns, prompt, response.text)
+    return dict(_usage(response), text=response.text)
+
+
+def stream(messages: list, usage: Dict | None = None) -> Iterator[str]:
+    """텍스트 조각(delta)을 순서대로 내보내고, 끝나면 usage dict에 토큰 수를 채웁니다."""
+    session, model_key, turns, prompt = _checkout(messages)
+    chunk = None
+    parts = []
+    try:
+        for chunk in session.send_message(prompt, stream=True):
+            # 안전 필터 등으로 parts가 비어 있는 청크는 건너뜁니다.
+            if chunk.parts:
+                parts.append(chunk.text)
+                yield chunk.text
+    except Exception as e:
+        _expire_model(model_key, e)
+        raise
+    # 끝까지 받은 세션만 재사용 (중간에 끊긴 세션은 히스토리가 불완전)
+    _checkin(session, model_key, turns, prompt, "".join(parts))
+    # 토큰 수는 마지막 청크에 누적 값으로 들어 있음
+    if usage is not None and chunk is not None:
+        usage.update(_usage(chunk))
+
+
+# === 오류를 "오류: ..." 문자열로 돌려주는 기존 인터페이스 ===
 def get_completion(messages: list) -> str:
     """Gemini API를 호출하여 응답을 반환합니다."""
-    if not model:
-        return "오류: Gemini 클라이언트가 초기화되지 않았습니다. API 키를 확인하세요."
-
-    # OpenAI/Anthropic 형식의 messages를 Gemini 형식으로 변환
-    gemini_messages = []
-    system_instruction = ""
-    for msg in messages:
-        if msg["role"] == "system":
-            system_instruction = msg["content"]
-            continue
-        gemini_messages.append(
-            {
-                "role": "user" if msg["role"] == "user" else "model",
-                "parts": [msg["content"]],
-            }
-        )
+    try:
+        return complete(messages)["text"]
+    except Exception as e:
+        return error_text(NAME, e)
+
+
+async def aget_completion(messages: list) -> str:
+    """get_completion의 비동기 버전"""
+    try:
+        return (await acomplete(messages))["text"]
+    except Exception as e:
+        return error_text(NAME, e)
 
-    # 마지막 메시지는 프롬프트로 사용하므로 히스토리에서 제거
-    last_user_prompt = ""
-    if gemini_messages and gemini_messages[-1]["role"] == "user":
-        last_user_prompt = gemini_messages.pop()["parts"][0]
 
+def stream_completion(messages: list) -> Iterator[str]:
+    """Gemini API 응답을 스트리밍으로 받아 텍스트 조각(delta)을 순서대로 반환합니다."""
     try:
-        chat_session = model.start_chat(history=gemini_messages)
-        full_prompt = (
-            (system_instruction + "\n\n---\n\n" + last_user_prompt)
-            if system_instruction
-            else last_user_prompt
-        )
-
-        response = chat_session.send_message(full_prompt)
-        return response.text
+        yield from stream(messages)
     except Exception as e:
-        return f"오류: Gemini API 호출 중 문제가 발생했습니다: {e}"
+        yield error_text(NAME, e)
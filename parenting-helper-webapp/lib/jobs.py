@@ -0,0 +1,127 @@
+# lib/jobs.py
+# 관리 도구(agent_admin.py)의 오래 걸리는 작업(debug/debate/propose) 실행기.
+# submit()은 작업 id를 바로 돌려주고, 작업은 프로세스 공용 스레드 풀에서 돌면서
+# 상태/중간 결과(모델별 리포트)/최종 결과를 data/jobs/<id>.json 에 그때그때 기록합니다.
+# 화면은 get()으로 이 파일을 읽어 진행 상황을 보여주므로, 여러 사람이 동시에 작업을 돌려도
+# Streamlit 세션이 서로를 기다리지 않습니다.
+import datetime
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+JOBS_DIR = os.environ.get("JOBS_DIR") or os.path.join(DATA_DIR, "jobs")
+MAX_WORKERS = int(os.environ.get("JOBS_WORKERS", 4))
+
+ACTIVE = ("queued", "running")
+
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="admin-job")
+_lock = threading.Lock()
+
+
+def _now() -> str:
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _path(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def _write(job: Dict) -> None:
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    tmp = f"{_path(job['id'])}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(job, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, _path(job["id"]))
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # 권한 없음 등: 살아 있는 것으로 본다
+    return True
+
+
+def _run(job: Dict, fn: Callable) -> None:
+    started = time.monotonic()
+
+    def emit(**event: Any) -> None:
+        """중간 결과 하나를 기록 (예: emit(stage="diagnosis", model=..., text=...))"""
+        with _lock:
+            event["elapsed"] = round(time.monotonic() - started, 1)
+            job["events"].append(event)
+            _write(job)
+
+    with _lock:
+        job.update(status="running", started_at=_now())
+        _write(job)
+    try:
+        result, status, error = fn(job["params"], emit), "done", None
+    except Exception as e:
+        result, status, error = None, "error", f"오류: {e}"
+    with _lock:
+        job.update(
+            status=status,
+            result=result,
+            error=error,
+            finished_at=_now(),
+            elapsed=round(time.monotonic() - started, 1),
+        )
+        _write(job)
+
+
+def submit(kind: str, params: Dict, fn: Callable[[Dict, Callable], Any]) -> str:
+    """fn(params, emit)을 백그라운드에서 실행하고 작업 id를 반환합니다.
+
+    fn의 반환값은 JSON으로 저장할 수 있어야 합니다.
+    """
+    job_id = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    job = {
+        "id": job_id,
+        "kind": kind,
+        "params": params,
+        "status": "queued",
+        "created_at": _now(),
+        "started_at": None,
+        "finished_at": None,
+        "elapsed": None,
+        "pid": os.getpid(),
+        "events": [],
+        "result": None,
+        "error": None,
+    }
+    with _lock:
+        _write(job)
+    _pool.submit(_run, job, fn)
+    return job_id
+
+
+def get(job_id: str) -> Dict | None:
+    """작업 상태. 실행하던 프로세스가 사라진 작업은 status가 "interrupted"로 보인다."""
+    try:
+        with open(_path(job_id), "r", encoding="utf-8") as f:
+            job = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if job["status"] in ACTIVE and not _alive(job["pid"]):
+        job["status"] = "interrupted"
+    return job
+
+
+def list_jobs(limit: int = 20) -> List[Dict]:
+    """최근 작업부터 (id가 생성 시각으로 시작하므로 이름 역순)"""
+    paths = sorted(glob.glob(os.path.join(JOBS_DIR, "*.json")), reverse=True)
+    jobs = []
+    for path in paths[:limit]:
+        job = get(os.path.splitext(os.path.basename(path))[0])
+        if job:
+            jobs.append(job)
+    return jobs
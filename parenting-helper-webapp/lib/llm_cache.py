@@ -0,0 +1,200 @@
+# lib/llm_cache.py
+# 동일한 LLM 요청에 대한 응답 캐시 (lib/providers.py 에서 사용).
+# - 키: (모델, 정규화된 messages, 파라미터)의 SHA-256
+# - 1단계: 프로세스 메모리 LRU / 2단계: 디스크(SQLite) + TTL + 용량 제한
+# - LLM_CACHE=0 으로 전체 비활성화, 호출마다 use_cache=False 로 건너뛰기
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+CACHE_PATH = os.environ.get("LLM_CACHE_PATH") or os.path.join(
+    DATA_DIR, "cache", "llm_cache.db"
+)
+
+ENABLED = os.environ.get("LLM_CACHE", "1") != "0"
+TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600))
+MEMORY_ENTRIES = int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", 256))
+DISK_MAX_BYTES = int(float(os.environ.get("LLM_CACHE_DISK_MB", 50)) * 1024 * 1024)
+
+# _lock은 메모리 LRU/카운터만 보호합니다. 디스크(SQLite) IO는 스레드별 연결로 잠금 밖에서
+_lock = threading.Lock()
+_memory: "OrderedDict[str, tuple[str, float]]" = OrderedDict()  # key -> (값, 만료 시각)
+_local = threading.local()
+_disk = {"size": None}  # 디스크 캐시 총 바이트 (누적 추정치, 넘었을 때만 다시 셈)
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def _normalize(messages: List[Dict]) -> List[Dict[str, str]]:
+    """키 계산용: role/content만 남기고 줄바꿈/앞뒤 공백 차이는 무시합니다. (ts 등 제외)"""
+    return [
+        {
+            "role": m.get("role", ""),
+            "content": "\n".join(
+                line.rstrip()
+                for line in str(m.get("content", "")).replace("\r\n", "\n").split("\n")
+            ).strip(),
+        }
+        for m in messages
+    ]
+
+
+def make_key(model: str, messages: List[Dict], params: Dict[str, Any] | None = None):
+    payload = json.dumps(
+        {"model": model, "messages": _normalize(messages), "params": params or {}},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _db() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key         TEXT PRIMARY KEY,
+                model       TEXT NOT NULL,
+                value       TEXT NOT NULL,
+                size        INTEGER NOT NULL,
+                expires_at  REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_access ON responses (last_access);
+            """
+        )
+        _local.conn = conn
+    return conn
+
+
+def _remember(key: str, value: str, expires_at: float) -> None:
+    _memory[key] = (value, expires_at)
+    _memory.move_to_end(key)
+    while len(_memory) > MEMORY_ENTRIES:
+        _memory.popitem(last=False)
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+
+
+def _add_size(db: sqlite3.Connection, delta: int) -> int:
+    """디스크 캐시 총 바이트를 delta만큼 갱신해 반환. SUM은 처음 한 번만 센다"""
+    with _lock:
+        if _disk["size"] is not None:
+            _disk["size"] += delta
+            return _disk["size"]
+    total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    with _lock:
+        _disk["size"] = total
+        return total
+
+
+def _evict(db: sqlite3.Connection, now: float) -> None:
+    """만료 항목을 지우고 다시 센 뒤, 용량을 넘으면 오래 안 쓴 항목부터 지웁니다."""
+    db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+    total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    victims = []
+    over = total - DISK_MAX_BYTES
+    if over > 0:
+        for k, s in db.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            victims.append((k,))
+            total -= s
+            over -= s
+            if over <= 0:
+                break
+        db.executemany("DELETE FROM responses WHERE key = ?", victims)
+    db.commit()
+    with _lock:
+        _disk["size"] = total
+        _stats["evictions"] += len(victims)
+
+
+def get(key: str) -> str | None:
+    """캐시된 응답 또는 None. 메모리 → 디스크 순으로 찾습니다."""
+    if not ENABLED:
+        return None
+    now = time.time()
+    with _lock:
+        hit = _memory.get(key)
+        if hit is not None:
+            if hit[1] > now:
+                _memory.move_to_end(key)
+                _stats["memory_hits"] += 1
+                return hit[0]
+            del _memory[key]
+
+    try:
+        db = _db()
+        row = db.execute(
+            "SELECT value, expires_at, size FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row and row[1] > now:
+            db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            db.commit()
+            with _lock:
+                _remember(key, row[0], row[1])
+                _stats["disk_hits"] += 1
+            return row[0]
+        if row:
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            db.commit()
+            _add_size(db, -row[2])
+    except sqlite3.Error as e:
+        print(f"경고: LLM 캐시 읽기 실패: {e}")
+    _count("misses")
+    return None
+
+
+def put(key: str, value: str, model: str = "", ttl: float | None = None) -> None:
+    """응답을 메모리/디스크에 저장하고, 디스크 용량을 넘으면 오래 안 쓴 항목부터 지웁니다."""
+    if not ENABLED:
+        return
+    now = time.time()
+    expires_at = now + (TTL_SECONDS if ttl is None else ttl)
+    size = len(value.encode("utf-8"))
+    with _lock:
+        _remember(key, value, expires_at)
+        _stats["stores"] += 1
+
+    try:
+        db = _db()
+        old = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        db.execute(
+            "INSERT OR REPLACE INTO responses"
+            " (key, model, value, size, expires_at, last_access)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, value, size, expires_at, now),
+        )
+        db.commit()
+        if _add_size(db, size - (old[0] if old else 0)) > DISK_MAX_BYTES:
+            _evict(db, now)
+    except sqlite3.Error as e:
+        print(f"경고: LLM 캐시 저장 실패: {e}")
+
+
+def stats() -> Dict[str, int]:
+    """히트/미스 카운터 (관리 화면/로그용)"""
+    with _lock:
+        return dict(_stats, memory_entries=len(_memory))
+
+
+def clear() -> None:
+    with _lock:
+        _memory.clear()
+        _disk["size"] = 0
+    try:
+        _db().execute("DELETE FROM responses")
+        _db().commit()
+    except sqlite3.Error as e:
+        print(f"경고: LLM 캐시 비우기 실패: {e}")
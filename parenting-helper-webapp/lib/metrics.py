@@ -0,0 +1,315 @@
+# lib/metrics.py
+# LLM 호출 계측 (lib/providers.py 에서 호출마다 record).
+# - 프로바이더/모델별: 요청 수, 오류 분류별 횟수, 재시도, 토큰, 캐시 히트,
+#   프로바이더 프롬프트 캐시에서 읽은 입력 토큰(cached_tokens)
+# - 지연 시간/첫 토큰까지 시간(TTFT): 최근 METRICS_WINDOW건의 롤링 윈도우(백분위수) +
+#   누적 히스토그램 버킷(Prometheus)
+# - METRICS_TRACE_PATH: 호출 1건 = 1줄 JSONL 트레이스 (설정 시에만)
+# - METRICS_PROM_PATH: Prometheus 텍스트 형식 파일을 주기적으로 덮어씀 (설정 시에만)
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+
+WINDOW = int(os.environ.get("METRICS_WINDOW", 500))
+TRACE_PATH = os.environ.get("METRICS_TRACE_PATH")
+PROM_PATH = os.environ.get("METRICS_PROM_PATH")
+PROM_INTERVAL = 10.0  # Prometheus 파일을 다시 쓰는 최소 간격(초)
+BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+_lock = threading.Lock()
+_series: Dict[Tuple[str, str], Dict] = {}
+_last_prom_dump = 0.0
+
+
+def classify_error(e: BaseException) -> str:
+    """예외를 재시도/대시보드용 분류로 바꿉니다.
+
+    timeout | rate_limit | server | client | connection | not_ready | circuit_open
+    | other
+    """
+    name = type(e).__name__
+    status = getattr(e, "status_code", None) or getattr(
+        getattr(e, "response", None), "status_code", None
+    )
+    if name == "ProviderNotReady":
+        return "not_ready"
+    if name == "CircuitOpen":
+        return "circuit_open"
+    if "Timeout" in name or isinstance(e, TimeoutError):
+        return "timeout"
+    if status == 429 or "RateLimit" in name or "ResourceExhausted" in name:
+        return "rate_limit"
+    if isinstance(status, int) and status >= 500:
+        return "server"
+    if "ServiceUnavailable" in name or "InternalServerError" in name:
+        return "server"
+    if isinstance(status, int) and status >= 400:
+        return "client"
+    if "Connection" in name or isinstance(e, ConnectionError):
+        return "connection"
+    return "other"
+
+
+def _new_series() -> Dict:
+    return {
+        "requests": 0,
+        "errors": {},
+        "retries": 0,
+        "cache_hits": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cached_tokens": 0,
+        "latency": deque(maxlen=WINDOW),  # ms
+        "ttft": deque(maxlen=WINDOW),  # ms (스트리밍만)
+        "buckets": [0] * (len(BUCKETS_MS) + 1),  # 마지막 칸 = +Inf
+        "latency_sum": 0.0,
+        "latency_count": 0,
+    }
+
+
+def _add(
+    series: Dict,
+    provider: str,
+    model: str,
+    latency_ms: float,
+    ttft_ms: float | None,
+    prompt_tokens: int | None,
+    completion_tokens: int | None,
+    retries: int,
+    error_class: str | None,
+    cached: bool,
+    cached_tokens: int | None = None,
+) -> None:
+    s = series.setdefault((provider, model), _new_series())
+    s["requests"] += 1
+    s["retries"] += retries
+    if cached:
+        s["cache_hits"] += 1
+    else:
+        # 캐시 히트는 지연 분포를 왜곡하므로 실제 호출만 넣는다
+        s["latency"].append(latency_ms)
+        s["latency_sum"] += latency_ms
+        s["latency_count"] += 1
+        i = next(
+            (i for i, b in enumerate(BUCKETS_MS) if latency_ms <= b), len(BUCKETS_MS)
+        )
+        s["buckets"][i] += 1
+        if ttft_ms is not None:
+            s["ttft"].append(ttft_ms)
+    if error_class:
+        s["errors"][error_class] = s["errors"].get(error_class, 0) + 1
+    s["prompt_tokens"] += prompt_tokens or 0
+    s["completion_tokens"] += completion_tokens or 0
+    s["cached_tokens"] += cached_tokens or 0
+
+
+def record(
+    provider: str,
+    model: str,
+    latency: float,
+    ttft: float | None = None,
+    prompt_tokens: int | None = None,
+    completion_tokens: int | None = None,
+    retries: int = 0,
+    error: BaseException | str | None = None,
+    cached: bool = False,
+    cached_tokens: int | None = None,
+) -> None:
+    """호출 1건을 기록합니다. latency/ttft는 초 단위. error는 예외 또는 분류 문자열.
+
+    cached는 우리 응답 캐시(lib/llm_cache.py) 히트, cached_tokens는 프로바이더 쪽
+    프롬프트 캐시에서 읽은 입력 토큰 수입니다.
+    """
+    error_class = None
+    if error is not None:
+        error_class = error if isinstance(error, str) else classify_error(error)
+    latency_ms = latency * 1000
+    ttft_ms = None if ttft is None else ttft * 1000
+
+    with _lock:
+        _add(
+            _series,
+            provider,
+            model,
+            latency_ms,
+            ttft_ms,
+            prompt_tokens,
+            completion_tokens,
+            retries,
+            error_class,
+            cached,
+            cached_tokens,
+        )
+        if TRACE_PATH:
+            row = {
+                "ts": time.time(),
+                "provider": provider,
+                "model": model,
+                "latency_ms": round(latency_ms, 1),
+                "ttft_ms": None if ttft_ms is None else round(ttft_ms, 1),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cached_tokens": cached_tokens,
+                "retries": retries,
+                "error": error_class,
+                "error_type": None if error is None else type(error).__name__,
+                "cached": cached,
+            }
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(TRACE_PATH)), exist_ok=True)
+                with open(TRACE_PATH, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"경고: 메트릭 트레이스 기록 실패: {e}")
+
+    if PROM_PATH:
+        _maybe_dump_prometheus()
+
+
+def _pct(values, q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def percentile(provider: str, model: str, q: float, field: str = "latency"):
+    """최근 윈도우의 백분위수(ms). 기록이 없으면 None"""
+    with _lock:
+        s = _series.get((provider, model))
+        return _pct(list(s[field]), q) if s else None
+
+
+def sample_count(provider: str, model: str) -> int:
+    """최근 윈도우에 든 실제 호출(캐시 히트 제외) 수"""
+    with _lock:
+        s = _series.get((provider, model))
+        return len(s["latency"]) if s else 0
+
+
+def summary(series: Dict | None = None) -> List[Dict]:
+    """프로바이더/모델별 요약 (관리 화면 표시용). 기본은 이 프로세스의 기록"""
+    rows = []
+    with _lock:
+        for (provider, model), s in sorted(
+            (_series if series is None else series).items()
+        ):
+            latency, ttft = list(s["latency"]), list(s["ttft"])
+            errors = sum(s["errors"].values())
+            prompt_tokens = s["prompt_tokens"]
+            rows.append(
+                {
+                    "provider": provider,
+                    "model": model,
+                    "requests": s["requests"],
+                    "errors": errors,
+                    "error_rate": round(errors / s["requests"], 3),
+                    "error_classes": dict(s["errors"]),
+                    "retries": s["retries"],
+                    "cache_hits": s["cache_hits"],
+                    "p50_ms": _pct(latency, 0.5),
+                    "p95_ms": _pct(latency, 0.95),
+                    "p99_ms": _pct(latency, 0.99),
+                    "ttft_p50_ms": _pct(ttft, 0.5),
+                    "ttft_p95_ms": _pct(ttft, 0.95),
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": s["completion_tokens"],
+                    "cached_tokens": s["cached_tokens"],
+                    "prompt_cache_rate": (
+                        round(s["cached_tokens"] / prompt_tokens, 3)
+                        if prompt_tokens
+                        else None
+                    ),
+                }
+            )
+    return rows
+
+
+def trace_summary(path: str | None = None, max_rows: int = 20000) -> List[Dict]:
+    """JSONL 트레이스의 최근 max_rows건으로 만든 요약 (앱 등 다른 프로세스의 호출 포함)"""
+    path = path or TRACE_PATH
+    if not path or not os.path.exists(path):
+        return []
+    series: Dict = {}
+    with open(path, "r", encoding="utf-8") as f:
+        lines = deque(f, maxlen=max_rows)
+    for line in lines:
+        try:
+            r = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        _add(
+            series,
+            r["provider"],
+            r["model"],
+            r["latency_ms"],
+            r.get("ttft_ms"),
+            r.get("prompt_tokens"),
+            r.get("completion_tokens"),
+            r.get("retries", 0),
+            r.get("error"),
+            r.get("cached", False),
+            r.get("cached_tokens"),
+        )
+    return summary(series)
+
+
+def prometheus_text() -> str:
+    """Prometheus 텍스트 노출 형식"""
+    out = [
+        "# TYPE llm_requests_total counter",
+        "# TYPE llm_errors_total counter",
+        "# TYPE llm_retries_total counter",
+        "# TYPE llm_cache_hits_total counter",
+        "# TYPE llm_tokens_total counter",
+        "# TYPE llm_latency_ms histogram",
+    ]
+    with _lock:
+        for (provider, model), s in sorted(_series.items()):
+            labels = f'provider="{provider}",model="{model}"'
+            out.append(f"llm_requests_total{{{labels}}} {s['requests']}")
+            for cls, n in sorted(s["errors"].items()):
+                out.append(f'llm_errors_total{{{labels},class="{cls}"}} {n}')
+            out.append(f"llm_retries_total{{{labels}}} {s['retries']}")
+            out.append(f"llm_cache_hits_total{{{labels}}} {s['cache_hits']}")
+            for kind in ("prompt", "completion", "cached"):
+                out.append(
+                    f'llm_tokens_total{{{labels},kind="{kind}"}}'
+                    f" {s[kind + '_tokens']}"
+                )
+            cumulative = 0
+            for bound, n in zip(list(BUCKETS_MS) + ["+Inf"], s["buckets"]):
+                cumulative += n
+                out.append(
+                    f'llm_latency_ms_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            out.append(f"llm_latency_ms_sum{{{labels}}} {s['latency_sum']:.1f}")
+            out.append(f"llm_latency_ms_count{{{labels}}} {s['latency_count']}")
+    return "\n".join(out) + "\n"
+
+
+def dump_prometheus(path: str) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+def _maybe_dump_prometheus() -> None:
+    global _last_prom_dump
+    now = time.monotonic()
+    if now - _last_prom_dump < PROM_INTERVAL:
+        return
+    _last_prom_dump = now
+    try:
+        dump_prometheus(PROM_PATH)
+    except OSError as e:
+        print(f"경고: Prometheus 메트릭 기록 실패: {e}")
+
+
+def reset() -> None:
+    with _lock:
+        _series.clear()
@@ -1,59 +1,111 @@
 # lib/prompt_manager.py
 import os
-import re
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Tuple
 
 import yaml
+from lib.router import KeywordRouter, Router
+
+try:  # 선택 의존성: numpy가 있으면 ROUTER_MODE=semantic 사용 가능
+    from lib.semantic_router import SemanticRouter
+except ImportError:
+    SemanticRouter = None
 
 PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "prompts")
 
+# === 프롬프트 레지스트리 ===
+# 파일별 (mtime_ns, size)를 기억해 두고, 바뀐 파일만 다시 파싱합니다.
+_lock = threading.Lock()
+# 파일명 -> (상태, 데이터)
+_files: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_by_id: Dict[str, Dict[str, Any]] = {}
+_sorted: List[Dict[str, Any]] = []
+
+
+def _parse(filename: str) -> Dict[str, Any]:
+    filepath = os.path.join(PROMPTS_DIR, filename)
+    with open(filepath, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    data.setdefault("id", os.path.splitext(filename)[0])
+    return data
+
+
+def _refresh() -> None:
+    """프롬프트 디렉터리를 stat 해서 추가/수정/삭제된 파일만 반영합니다."""
+    global _by_id, _sorted
+    with _lock:
+        seen = {}
+        with os.scandir(PROMPTS_DIR) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith((".yml", ".yaml")):
+                    st = entry.stat()
+                    seen[entry.name] = (st.st_mtime_ns, st.st_size)
+
+        changed = seen.keys() != _files.keys()
+        for filename, state in seen.items():
+            cached = _files.get(filename)
+            if cached is None or cached[0] != state:
+                _files[filename] = (state, _parse(filename))
+                changed = True
+        for filename in set(_files) - set(seen):
+            del _files[filename]
+
+        if changed:
+            prompts = [data for _, data in _files.values()]
+            _sorted = sorted(prompts, key=lambda x: x.get("name", ""))
+            _by_id = {p["id"]: p for p in prompts}
+
+
+def reload() -> None:
+    """캐시를 비우고 모든 프롬프트 파일을 다시 읽습니다. (관리 도구에서 수정 직후 호출)"""
+    with _lock:
+        _files.clear()
+    _refresh()
+
 
 def get_prompts() -> List[Dict[str, Any]]:
-    prompts = []
-    for filename in os.listdir(PROMPTS_DIR):
-        if filename.endswith((".yml", ".yaml")):
-            filepath = os.path.join(PROMPTS_DIR, filename)
-            with open(filepath, "r", encoding="utf-8") as f:
-                data = yaml.safe_load(f)
-            data.setdefault("id", os.path.splitext(filename)[0])
-            prompts.append(data)
-    return sorted(prompts, key=lambda x: x.get("name", ""))
+    _refresh()
+    return list(_sorted)
+
+
+def get_prompt(prompt_id: str) -> Dict[str, Any] | None:
+    _refresh()
+    return _by_id.get(prompt_id)
 
 
 def get_system_prompt(prompt_id: str) -> Dict[str, Any]:
-    for p in get_prompts():
-        if p.get("id") == prompt_id:
-            return {"role": "system", "content": p.get("content", "")}
+    p = get_prompt(prompt_id)
+    if p is not None:
+        return {"role": "system", "content": p.get("content", "")}
     # fallback (가능하면 사용되지 않도록)
     return {"role": "system", "content": "너는 유용한 육아 도우미 AI야."}
 
 
-# === 간단 라우터 ===
-_EMERGENCY = r"(응급|119|ER|호흡곤란|무호흡|청색증|탈수|경련|의식\s*소실|심한\s*구토|피\s*섞인\s*변|35(\.\d+)?°?이하|40(\.\d+)?°?이상)"
-_SOOTHING_POS = (
-    r"(위로|격려|지쳐|힘들|버거워|자책|불안|좌절|멘탈|울컥|토닥|감정\s*정리)"
-)
-_INFO_POS = r"(모유|분유|수유|수면|낮잠|밤중수유|스케줄|계획|발진|아토피|체온|예방접종|변\s*색|트림|토|\b개월\b|\b주차\b|가이드|권고|루틴|졸업|스트랩|쪽쪽이)"
+# === 페르소나 라우터 (lib/router.py, lib/semantic_router.py) ===
+# 프롬프트 YAML의 router 설정이 바뀌었을 때만 다시 컴파일합니다.
+# ROUTER_MODE=semantic 이면 예문 임베딩 라우터 (numpy 필요, 없으면 키워드 라우터)
+ROUTER_MODE = os.environ.get("ROUTER_MODE", "keyword")
+_router: Dict[str, Any] = {"source": None, "router": None}
 
 
-def select_prompt_id(
-    user_text: str, history_text: str = "", last_route: str | None = None
-) -> str:
-    text = f"{history_text}\n{user_text}".lower()
+def _make_router(prompts: List[Dict[str, Any]]) -> Router:
+    if ROUTER_MODE == "semantic":
+        if SemanticRouter is not None:
+            return SemanticRouter(prompts)
+        print("경고: numpy가 없어 키워드 라우터를 사용합니다.")
+    return KeywordRouter(prompts)
 
-    # 1) 응급 오버라이드
-    if re.search(_EMERGENCY, text, flags=re.IGNORECASE):
-        return "parenting_expert_v1"
 
-    # 2) 점수 계산(가중치 가능)
-    s_score = len(re.findall(_SOOTHING_POS, text, flags=re.IGNORECASE))
-    i_score = len(re.findall(_INFO_POS, text, flags=re.IGNORECASE))
+def get_router() -> Router:
+    _refresh()
+    snapshot = _sorted
+    with _lock:
+        if _router["source"] is not snapshot:
+            _router.update(source=snapshot, router=_make_router(snapshot))
+        return _router["router"]
 
-    # 3) 차이 기준
-    if i_score - s_score >= 1:
-        return "parenting_expert_v1"
-    if s_score - i_score >= 1:
-        return "soothing_expert_v1"
 
-    # 4) 동점이면 직전 라우트 유지, 없으면 정보 도우미
-    return last_route or "parenting_expert_v1"
+def select_prompt_id(
+    user_text: str, history_text: str = "", last_route: str | None = None
+) -> str:
+    return get_router().select(user_text, history_text, last_route=last_route)
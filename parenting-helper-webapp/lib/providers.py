@@ -0,0 +1,545 @@
+# lib/providers.py
+# LLM 프로바이더 레지스트리.
+# - 모델 이름 → 프로바이더 모듈(lib/*_client.py) 매핑
+# - SDK 클라이언트는 처음 호출될 때 만들고(지연 초기화), 이후 재사용
+# - OpenAI/DeepSeek은 keep-alive HTTP 연결 풀(httpx)을 공유 (Anthropic/Gemini는 SDK 자체 풀)
+# - 같은 요청은 lib/llm_cache.py 의 응답 캐시에서 바로 돌려줌 (use_cache=False 로 건너뜀)
+# - 호출마다 지연/TTFT/토큰/오류를 lib/metrics.py 에 기록
+# - 타임아웃/재시도/서킷 브레이커/대체 모델/헤지 요청은 lib/resilience.py 정책을 따름
+# - race_stream(): 여러 모델에 동시에 요청해 먼저 제대로 답하기 시작한 쪽을 쓰는 레이스 모드
+import asyncio
+import importlib
+import queue
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Iterator
+
+import httpx
+from lib import llm_cache, metrics, resilience
+
+# 프로바이더 이름 -> 구현 모듈
+PROVIDERS = {
+    "openai": "lib.openai_client",
+    "anthropic": "lib.anthropic_client",
+    "gemini": "lib.gemini_client",
+    "deepseek": "lib.deepseek_client",
+    "fake": "lib.fake_client",  # 오프라인 테스트용 (모델 이름 "fake")
+}
+DEFAULT_PROVIDER = "openai"
+
+_HTTP_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+_HTTP_LIMITS = httpx.Limits(
+    max_connections=50, max_keepalive_connections=20, keepalive_expiry=90.0
+)
+
+# factory 안에서 shared_http_client()를 다시 부르므로 재진입 가능한 RLock
+_lock = threading.RLock()
+_clients: Dict[str, Any] = {}
+_failed: set = set()  # 초기화 실패 메시지를 한 번만 출력하기 위함
+_http: Dict[str, httpx.Client] = {}
+# 비동기 클라이언트는 이벤트 루프에 묶이므로 루프별로 따로 보관합니다.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def resolve_provider(model_name: str) -> str:
+    """모델 이름으로 프로바이더를 고릅니다. 알 수 없으면 DEFAULT_PROVIDER."""
+    name = model_name.lower()
+    if "gpt" in name or "openai" in name:
+        return "openai"
+    if "claude" in name:
+        return "anthropic"
+    if "gemini" in name:
+        return "gemini"
+    if "deepseek" in name:
+        return "deepseek"
+    if name.startswith("fake"):
+        return "fake"
+    print(
+        f"경고: 알 수 없는 모델 '{model_name}'. 기본값인 OpenAI GPT-4o-mini로 호출합니다."
+    )
+    return DEFAULT_PROVIDER
+
+
+def get_provider(model_name: str):
+    """모델 이름에 해당하는 프로바이더 모듈(lib/*_client.py)을 필요할 때 import 합니다."""
+    return importlib.import_module(PROVIDERS[resolve_provider(model_name)])
+
+
+class ChainFailed(RuntimeError):
+    """대체 체인의 모든 모델이 실패함. errors는 시도한 순서대로 [(모델, 오류)]"""
+
+    def __init__(self, errors: list):
+        super().__init__(str(errors[0][1]))
+        self.errors = errors
+
+
+class StreamInterrupted(RuntimeError):
+    """스트리밍 답변이 도중에 끊김. 메시지는 사용자에게 보여줄 "오류: ..." 문구이고,
+    그때까지 넘긴 조각은 답변에 포함하지 않습니다 (화면에만 따로 표시)."""
+
+
+class ProviderNotReady(RuntimeError):
+    """클라이언트를 만들 수 없음 (API 키 없음 등). 메시지는 그대로 사용자에게 보여줍니다."""
+
+
+def error_text(name: str, e: BaseException) -> str:
+    """예외를 앱이 쓰는 "오류: ..." 응답 문자열로 바꿉니다."""
+    if isinstance(e, ProviderNotReady):
+        return str(e)
+    return f"오류: {name} API 호출 중 문제가 발생했습니다: {e}"
+
+
+# === 공유 HTTP 연결 풀 ===
+def shared_http_client() -> httpx.Client:
+    with _lock:
+        if "sync" not in _http:
+            _http["sync"] = httpx.Client(timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS)
+        return _http["sync"]
+
+
+def shared_async_http_client() -> httpx.AsyncClient:
+    return lazy_async_client(
+        "_http",
+        lambda: httpx.AsyncClient(timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS),
+    )
+
+
+# === 지연 초기화 ===
+def lazy_client(key: str, factory: Callable[[], Any]) -> Any | None:
+    """key별 클라이언트를 처음 요청될 때 factory()로 만들어 캐시합니다.
+
+    실패(API 키 없음 등)하면 None을 반환하고, 다음 호출에서 다시 시도합니다.
+    """
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        if key not in _clients:
+            try:
+                _clients[key] = factory()
+            except Exception as e:
+                if key not in _failed:
+                    print(f" {key} 클라이언트 초기화 실패: {e}")
+                    _failed.add(key)
+                return None
+        return _clients[key]
+
+
+def lazy_async_client(key: str, factory: Callable[[], Any]) -> Any | None:
+    """lazy_client의 비동기 버전. 현재 실행 중인 이벤트 루프별로 캐시합니다."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _async_clients.setdefault(loop, {})
+    if key not in per_loop:
+        try:
+            per_loop[key] = factory()
+        except Exception as e:
+            if key not in _failed:
+                print(f" {key} 클라이언트 초기화 실패: {e}")
+                _failed.add(key)
+            return None
+    return per_loop[key]
+
+
+# === 통합 호출 인터페이스 ===
+def _is_error(text: str) -> bool:
+    # 클라이언트들은 실패 시 "오류: ..." 문자열을 반환합니다. 이런 응답은 캐시하지 않음
+    return not text or text.startswith("오류:")
+
+
+def _cache_key(model_name: str, messages: list) -> tuple[str, str]:
+    """(캐시 키, 캐시에 기록할 실제 모델명). 별칭이 달라도 같은 모델이면 같은 키."""
+    module = get_provider(model_name)
+    model = f"{resolve_provider(model_name)}:{getattr(module, 'MODEL', model_name)}"
+    return llm_cache.make_key(model, messages), model
+
+
+def _labels(model_name: str) -> tuple[str, str]:
+    """메트릭 라벨 (프로바이더, 실제 모델명)"""
+    module = get_provider(model_name)
+    return resolve_provider(model_name), getattr(module, "MODEL", model_name)
+
+
+def _record(model_name: str, started: float, result=None, error=None, **kw) -> None:
+    result = result or {}
+    metrics.record(
+        *_labels(model_name),
+        time.perf_counter() - started,
+        prompt_tokens=result.get("prompt_tokens"),
+        completion_tokens=result.get("completion_tokens"),
+        cached_tokens=result.get("cached_tokens"),
+        error=error,
+        **kw,
+    )
+
+
+# === 한 모델 호출 (타임아웃 + 재시도 + 서킷 브레이커) ===
+def _call(model_name: str, messages: list) -> Dict:
+    module = get_provider(model_name)
+    provider = resolve_provider(model_name)
+    timeout = resilience.timeout_for(provider)
+
+    def attempt(n: int) -> Dict:
+        started = time.perf_counter()
+        try:
+            result = resilience.run_with_timeout(
+                lambda: module.complete(messages), timeout, provider
+            )
+        except Exception as e:
+            _record(model_name, started, error=e, retries=int(n > 0))
+            raise
+        _record(model_name, started, result, retries=int(n > 0))
+        return result
+
+    return resilience.with_retries(provider, attempt)
+
+
+async def _acall(model_name: str, messages: list) -> Dict:
+    module = get_provider(model_name)
+    provider = resolve_provider(model_name)
+    attempts = resilience.Attempts(provider)
+    for n in attempts:
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                module.acomplete(messages), resilience.timeout_for(provider)
+            )
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                e = resilience.CallTimeout("응답 시간 초과")
+            _record(model_name, started, error=e, retries=int(n > 0))
+            await asyncio.sleep(attempts.failed(n, e))
+            continue
+        _record(model_name, started, result, retries=int(n > 0))
+        attempts.succeeded()
+        return result
+
+
+def _chain(model_name: str, fallback: bool) -> list:
+    if not fallback:
+        return [model_name]
+    return resilience.fallback_chain(model_name, resolve_provider)
+
+
+def _dispatch(model_name: str, messages: list, fallback: bool) -> tuple[Dict, str]:
+    """대체 체인을 순서대로 시도합니다. 1순위가 p95 지연을 넘기면 다음 모델로 헤지.
+
+    (결과, 실제로 답한 모델 이름)을 반환하고, 모두 실패하면 ChainFailed를 올립니다.
+    """
+    chain = _chain(model_name, fallback)
+    errors = []  # (모델, 오류)
+    i = 0
+    while i < len(chain):
+        model = chain[i]
+        backup = chain[i + 1] if i + 1 < len(chain) else None
+        delay = resilience.hedge_delay(*_labels(model)) if backup else None
+        try:
+            if delay is not None:
+                return resilience.hedged(
+                    lambda: (_call(model, messages), model),
+                    lambda: (_call(backup, messages), backup),
+                    delay,
+                )
+            return _call(model, messages), model
+        except Exception as e:
+            # 헤지한 경우에도 hedged()는 1순위(model)의 오류를 올린다
+            errors.append((model, e))
+        i += 2 if delay is not None else 1
+    raise ChainFailed(errors)
+
+
+def _failure_text(errors: list) -> str:
+    """첫 번째로 실패한 모델의 오류를, 그 오류를 낸 프로바이더 이름으로 표시"""
+    model, error = errors[0]
+    return error_text(get_provider(model).NAME, error)
+
+
+def _note_fallback(model_name: str, used: str) -> None:
+    if used != model_name:
+        print(f" ↪ {model_name} 호출 실패로 {used}의 응답을 사용합니다.")
+
+
+def get_completion(
+    model_name: str, messages: list, use_cache: bool = True, fallback: bool = True
+) -> str:
+    """모델 이름에 맞는 프로바이더로 동기 호출합니다. 실패 시 "오류: ..." 문자열.
+
+    fallback=True면 실패 시 대체 체인의 다른 모델이 답할 수 있습니다.
+    """
+    started = time.perf_counter()
+    if use_cache:
+        key, model = _cache_key(model_name, messages)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            _record(model_name, started, cached=True)
+            return cached
+
+    try:
+        result, used = _dispatch(model_name, messages, fallback)
+    except ChainFailed as e:
+        return _failure_text(e.errors)
+    _note_fallback(model_name, used)
+
+    text = result["text"]
+    if use_cache and not _is_error(text):
+        # 대체 모델의 답은 그 모델의 키로 저장 (요청 모델의 답으로 재사용하지 않음)
+        key, model = _cache_key(used, messages)
+        llm_cache.put(key, text, model)
+    return text
+
+
+async def aget_completion(
+    model_name: str, messages: list, use_cache: bool = True, fallback: bool = True
+) -> str:
+    """모델 이름에 맞는 프로바이더로 비동기 호출합니다. (헤지 요청은 동기 호출에만 적용)"""
+    started = time.perf_counter()
+    if use_cache:
+        key, model = _cache_key(model_name, messages)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            _record(model_name, started, cached=True)
+            return cached
+
+    errors = []
+    for used in _chain(model_name, fallback):
+        try:
+            result = await _acall(used, messages)
+            break
+        except Exception as e:
+            errors.append((used, e))
+    else:
+        return _failure_text(errors)
+    _note_fallback(model_name, used)
+
+    text = result["text"]
+    if use_cache and not _is_error(text):
+        key, model = _cache_key(used, messages)
+        llm_cache.put(key, text, model)
+    return text
+
+
+def stream_completion(
+    model_name: str, messages: list, use_cache: bool = True, fallback: bool = True
+) -> Iterator[str]:
+    """모델 이름에 맞는 프로바이더의 스트리밍 응답(텍스트 조각)을 그대로 넘깁니다.
+
+    캐시 히트면 저장된 전체 답변을 한 번에 내보내고, 미스면 끝까지 받은 답변을 저장합니다.
+    첫 조각이 오기 전의 실패는 재시도/대체 모델로 넘어가고, 답변 도중의 실패는 되돌릴 수
+    없으므로 StreamInterrupted를 올립니다.
+    """
+    started = time.perf_counter()
+    if use_cache:
+        key, model = _cache_key(model_name, messages)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            _record(model_name, started, cached=True)
+            yield cached
+            return
+
+    errors = []  # (모델, 오류)
+    for used in _chain(model_name, fallback):
+        module = get_provider(used)
+        provider = resolve_provider(used)
+        attempts = resilience.Attempts(provider)
+        try:
+            for n in attempts:
+                started = time.perf_counter()
+                usage: Dict[str, Any] = {}
+                parts = []
+                ttft = None
+                try:
+                    for delta in resilience.stream_with_timeout(
+                        lambda: module.stream(messages, usage),
+                        resilience.FIRST_TOKEN_TIMEOUT,
+                        resilience.timeout_for(provider),
+                    ):
+                        if ttft is None:
+                            ttft = time.perf_counter() - started
+                            _note_fallback(model_name, used)
+                        parts.append(delta)
+                        yield delta
+                except Exception as e:
+                    _record(
+                        used, started, usage, error=e, ttft=ttft, retries=int(n > 0)
+                    )
+                    if parts:
+                        attempts.record_failure(e)
+                        raise StreamInterrupted(error_text(module.NAME, e)) from e
+                    time.sleep(attempts.failed(n, e))
+                    continue
+
+                _record(used, started, usage, ttft=ttft, retries=int(n > 0))
+                attempts.succeeded()
+                text = "".join(parts)
+                if use_cache and not _is_error(text):
+                    key, model = _cache_key(used, messages)
+                    llm_cache.put(key, text, model)
+                return
+        except StreamInterrupted:
+            raise
+        except Exception as e:
+            # 재시도를 다 썼거나 재시도할 수 없는 오류, 또는 서킷 브레이커 차단
+            errors.append((used, e))
+
+    yield _failure_text(errors)
+
+
+# === 레이스 모드: 여러 모델에 동시에 보내고 먼저 유효한 답을 시작한 모델을 사용 ===
+def _race_valid(text: str, done: bool) -> bool | None:
+    """후보 응답이 쓸 만한지. 아직 판단하기 이르면 None"""
+    head = text.lstrip()
+    if head.startswith("오류:"):
+        return False
+    if len(head) >= len("오류:"):
+        return True
+    return bool(head) if done else None
+
+
+def _race_runner(model_name: str, messages: list, events: queue.Queue, cancel) -> None:
+    """한 후보의 스트림을 읽어 (모델, 종류, 값) 이벤트로 넘깁니다. 재시도는 하지 않음
+
+    cancel이 set되면 다음 조각이 올 때 스트림(HTTP 응답)을 닫고 조용히 끝냅니다.
+    """
+    module = get_provider(model_name)
+    provider = resolve_provider(model_name)
+    attempts = resilience.Attempts(provider)
+    try:
+        attempts.check()
+    except Exception as e:
+        events.put((model_name, "error", e))
+        return
+    started = time.perf_counter()
+    usage: Dict[str, Any] = {}
+    ttft = None
+    chunks = resilience.stream_with_timeout(
+        lambda: module.stream(messages, usage),
+        resilience.FIRST_TOKEN_TIMEOUT,
+        resilience.timeout_for(provider),
+        cancel=cancel,
+    )
+    try:
+        for delta in chunks:
+            if cancel.is_set():
+                break
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            events.put((model_name, "chunk", delta))
+    except Exception as e:
+        if cancel.is_set():
+            return
+        _record(model_name, started, usage, error=e, ttft=ttft)
+        attempts.record_failure(e)
+        events.put((model_name, "error", e))
+        return
+    finally:
+        chunks.close()
+    if cancel.is_set():
+        # 진 후보는 지연 분포를 왜곡하지 않도록 메트릭에 넣지 않는다
+        return
+    _record(model_name, started, usage, ttft=ttft)
+    attempts.succeeded()
+    events.put((model_name, "done", None))
+
+
+def race_stream(models: list, messages: list, use_cache: bool = True) -> Iterator[str]:
+    """models 모두에 스트리밍 요청을 보내, 가장 먼저 유효한 답을 시작한 모델의 조각을 넘깁니다.
+
+    나머지 요청은 취소 신호를 받아 다음 조각이 올 때 스트림을 닫고 끝나며(메트릭에서 제외),
+    승자와 모델별 소요 시간을 로그로 남깁니다.
+    모두 실패하면 첫 모델의 오류 문구, 승자가 답변 도중 실패하면 StreamInterrupted.
+    """
+    models = list(dict.fromkeys(models))
+    if use_cache:
+        for m in models:
+            key, _ = _cache_key(m, messages)
+            cached = llm_cache.get(key)
+            if cached is not None:
+                _record(m, time.perf_counter(), cached=True)
+                yield cached
+                return
+
+    started = time.perf_counter()
+    events: queue.Queue = queue.Queue()
+    cancels = {m: threading.Event() for m in models}
+    for m in models:
+        threading.Thread(
+            target=_race_runner,
+            args=(m, messages, events, cancels[m]),
+            daemon=True,
+            name="llm-race",
+        ).start()
+
+    parts = {m: [] for m in models}
+    status: Dict[str, str] = {}  # 모델 -> 승/취소/실패/무효 (로그용)
+    times: Dict[str, list] = {m: [] for m in models}
+    errors: Dict[str, BaseException] = {}
+    pending, winner = set(models), None
+
+    def finish(model: str, elapsed: str) -> None:
+        times[model].append(f"완료 {elapsed}")
+        text = "".join(parts[model])
+        if use_cache and not _is_error(text):
+            key, cache_model = _cache_key(model, messages)
+            llm_cache.put(key, text, cache_model)
+
+    try:
+        while pending:
+            model, kind, value = events.get()
+            if model not in pending:
+                continue  # 이미 탈락/취소된 후보의 늦은 이벤트
+            elapsed = f"{time.perf_counter() - started:.2f}s"
+            if kind == "error":
+                pending.discard(model)
+                errors[model] = value
+                status.setdefault(model, "실패")
+                times[model].append(f"실패 {elapsed}" if model == winner else elapsed)
+                if model == winner:
+                    text = error_text(get_provider(model).NAME, value)
+                    raise StreamInterrupted(text) from value
+                continue
+            if kind == "chunk":
+                parts[model].append(value)
+                if model == winner:
+                    yield value
+                    continue
+            else:
+                pending.discard(model)
+                if model == winner:
+                    finish(model, elapsed)
+                    continue
+            valid = _race_valid("".join(parts[model]), done=kind == "done")
+            if valid is False:
+                cancels[model].set()
+                pending.discard(model)
+                errors[model] = ValueError("".join(parts[model]) or "빈 응답")
+                status[model] = "무효"
+                times[model].append(elapsed)
+            elif valid:
+                winner = model
+                status[model] = "승"
+                times[model].append(f"첫 토큰 {elapsed}")
+                for other in pending - {model}:
+                    cancels[other].set()
+                    status[other] = "취소"
+                    times[other].append(elapsed)
+                pending = {model} if kind == "chunk" else set()
+                yield "".join(parts[model])
+                if kind == "done":
+                    finish(model, elapsed)
+    finally:
+        for event in cancels.values():
+            event.set()
+        print(
+            f" 🏁 레이스 승자: {winner or '없음'} | "
+            + ", ".join(
+                f"{m} {status.get(m, '취소')} ({', '.join(times[m]) or '-'})"
+                for m in models
+            )
+        )
+
+    if winner is None:
+        first = next(m for m in models if m in errors)
+        yield error_text(get_provider(first).NAME, errors[first])
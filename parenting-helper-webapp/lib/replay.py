@@ -0,0 +1,95 @@
+# lib/replay.py
+# 저장된 대화(data/conversations)와 아카이브(data/archive)의 사용자 턴을 다시 재생하는
+# 도구(agent_i eval 등)용 유틸: 코퍼스 순회 + 간단한 요청 속도 제한.
+import glob
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+
+def _conversation_files(conv_dir: str) -> Dict[str, str]:
+    """cid -> 파일 경로. 같은 cid에 .json과 .jsonl이 함께 있으면 .json(미압축)이 최신"""
+    files = {}
+    for path in sorted(glob.glob(os.path.join(conv_dir, "*.json*"))):
+        cid, ext = os.path.splitext(os.path.basename(path))
+        if cid == "index" or ext not in (".json", ".jsonl"):
+            continue
+        if ext == ".json" or cid not in files:
+            files[cid] = path
+    return files
+
+
+def _load(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            # 끝의 손상된 줄(쓰는 도중 중단)은 건너뜀
+            messages = []
+            for line in f:
+                try:
+                    messages.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+            return messages
+        data = json.load(f)
+    return data if isinstance(data, list) else []
+
+
+def iter_user_turns(
+    conv_dir: str | None = None,
+    archive_dir: str | None = None,
+    include_archive: bool = True,
+) -> Iterator[Dict]:
+    """사용자 턴을 하나씩 돌려줍니다. (파일을 하나씩 읽으므로 코퍼스가 커도 메모리 일정)
+
+    {"case_id": "<출처>:<cid>:<순번>", "source", "conversation", "seq", "input"}
+    """
+    conv_dir = conv_dir or os.path.join(DATA_DIR, "conversations")
+    archive_dir = archive_dir or os.path.join(DATA_DIR, "archive")
+    sources = [("conv", _conversation_files(conv_dir))]
+    if include_archive:
+        archives = {
+            os.path.splitext(os.path.basename(p))[0]: p
+            for p in sorted(glob.glob(os.path.join(archive_dir, "*.json")))
+        }
+        sources.append(("archive", archives))
+
+    for source, files in sources:
+        for cid, path in files.items():
+            try:
+                messages = _load(path)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"건너뜀: {path} ({e})")
+                continue
+            for seq, m in enumerate(messages):
+                if m.get("role") != "user" or not m.get("content", "").strip():
+                    continue
+                yield {
+                    "case_id": f"{source}:{cid}:{seq}",
+                    "source": source,
+                    "conversation": cid,
+                    "seq": seq,
+                    "input": m["content"],
+                }
+
+
+class RateLimiter:
+    """초당 rate회 이하로 호출 간격을 맞춥니다. 여러 스레드에서 같이 써도 안전합니다."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,327 @@
+# lib/resilience.py
+# LLM 호출 디스패치 정책 (lib/providers.py 에서 사용).
+# - 프로바이더별 타임아웃 (스트리밍은 첫 토큰/토큰 사이 대기 시간)
+# - 429/5xx/타임아웃/연결 오류는 지터를 넣은 지수 백오프로 재시도 (Retry-After 우선)
+# - 프로바이더별 서킷 브레이커: 연속 실패가 쌓이면 잠시 호출하지 않고 바로 다음 모델로
+# - 대체 체인: gpt-4o-mini → deepseek-chat → claude haiku (LLM_FALLBACK_CHAIN)
+# - 헤지 요청: 1순위가 최근 p95 지연을 넘기면 다음 모델에도 동시에 요청, 먼저 온 답 사용
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Iterator, List
+
+from lib import metrics
+
+TIMEOUTS = {"openai": 60.0, "deepseek": 90.0, "anthropic": 60.0, "gemini": 60.0}
+DEFAULT_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 60))
+FIRST_TOKEN_TIMEOUT = float(os.environ.get("LLM_FIRST_TOKEN_TIMEOUT", 30))
+MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 2))
+BACKOFF_BASE = 0.5  # 초
+BACKOFF_CAP = 8.0
+RETRYABLE = {"timeout", "rate_limit", "server", "connection"}
+
+FALLBACK_CHAIN = [
+    m.strip()
+    for m in os.environ.get(
+        "LLM_FALLBACK_CHAIN", "gpt-4o-mini,deepseek-chat,claude-3-5-haiku"
+    ).split(",")
+    if m.strip()
+]
+
+HEDGE_ENABLED = os.environ.get("LLM_HEDGE", "1") != "0"
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20  # 지연 기록이 이만큼 쌓이기 전에는 헤지하지 않음
+
+BREAKER_THRESHOLD = 5  # 연속 실패 횟수
+BREAKER_COOLDOWN = 30.0  # 차단 유지 시간(초). 지나면 한 번 시험 호출
+
+# 타임아웃을 걸기 위해 호출은 작업 스레드에서 실행 (헤지는 별도 풀: 중첩 대기로 인한 고갈 방지)
+# 호출 풀은 프로바이더마다 따로 둔다: 멈춘 호출은 HTTP 타임아웃까지 스레드를 잡고 있으므로
+# 한 프로바이더가 멈춰도 자기 풀(CALL_WORKERS개)만 차고 다른 프로바이더는 영향이 없다
+CALL_WORKERS = int(os.environ.get("LLM_CALL_WORKERS", 8))
+_call_pools: Dict[str, ThreadPoolExecutor] = {}
+_call_pools_lock = threading.Lock()
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+
+class CallTimeout(TimeoutError):
+    """프로바이더가 제한 시간 안에 응답하지 않음"""
+
+
+class CircuitOpen(RuntimeError):
+    """서킷 브레이커가 열려 있어 호출하지 않음"""
+
+
+class CircuitBreaker:
+    def __init__(
+        self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # half-open: 이번 한 번만 통과시키고, 결과가 나올 때까지 다시 막는다
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(provider: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker()
+        return _breakers[provider]
+
+
+def breaker_states() -> Dict[str, str]:
+    with _breakers_lock:
+        return {p: b.state for p, b in _breakers.items()}
+
+
+def timeout_for(provider: str) -> float:
+    return TIMEOUTS.get(provider, DEFAULT_TIMEOUT)
+
+
+def is_retryable(error: BaseException) -> bool:
+    return metrics.classify_error(error) in RETRYABLE
+
+
+def counts_as_failure(error: BaseException) -> bool:
+    """서킷 브레이커에 반영할 실패인지. 키 없음/잘못된 요청은 프로바이더 장애가 아님"""
+    return metrics.classify_error(error) not in ("not_ready", "client")
+
+
+def backoff_delay(attempt: int, error: BaseException | None = None) -> float:
+    """attempt번째 재시도 전 대기 시간. 서버가 Retry-After를 주면 그 값을 따른다."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    retry_after = headers.get("retry-after") if hasattr(headers, "get") else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_CAP)
+        except ValueError:
+            pass
+    # full jitter: [0.5, 1.0) × 지수 증가분
+    return min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt) * random.uniform(0.5, 1.0)
+
+
+def fallback_chain(model_name: str, provider_of: Callable[[str], str]) -> List[str]:
+    """요청 모델을 맨 앞에 두고, FALLBACK_CHAIN에서 아직 없는 프로바이더만 이어 붙입니다."""
+    chain, seen = [model_name], {provider_of(model_name)}
+    for m in FALLBACK_CHAIN:
+        p = provider_of(m)
+        if p not in seen:
+            chain.append(m)
+            seen.add(p)
+    return chain
+
+
+def hedge_delay(provider: str, model: str) -> float | None:
+    """헤지 요청을 보낼 대기 시간(초). 꺼져 있거나 기록이 부족하면 None"""
+    if not HEDGE_ENABLED:
+        return None
+    if metrics.sample_count(provider, model) < HEDGE_MIN_SAMPLES:
+        return None
+    p95 = metrics.percentile(provider, model, HEDGE_QUANTILE)
+    return p95 / 1000 if p95 else None
+
+
+def _call_pool(provider: str) -> ThreadPoolExecutor:
+    with _call_pools_lock:
+        if provider not in _call_pools:
+            _call_pools[provider] = ThreadPoolExecutor(
+                max_workers=CALL_WORKERS, thread_name_prefix=f"llm-call-{provider}"
+            )
+        return _call_pools[provider]
+
+
+def run_with_timeout(fn: Callable[[], Any], timeout: float, provider: str = "") -> Any:
+    """fn()을 provider의 작업 스레드에서 실행하고 timeout초 안에 끝나지 않으면 CallTimeout.
+
+    (이미 시작된 호출은 백그라운드에서 HTTP 타임아웃까지 진행되고 결과는 버려집니다.
+    풀이 가득 차 아직 시작하지 못한 호출은 취소되어 실행되지 않습니다)
+    """
+    future = _call_pool(provider).submit(fn)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise CallTimeout(f"{timeout:.0f}초 안에 응답이 없었습니다.") from None
+
+
+class Attempts:
+    """재시도/서킷 브레이커 정책을 한곳에 모은 시도 루프 (동기/비동기/스트리밍 공용).
+
+    attempts = Attempts(provider)
+    for n in attempts:  # 차단돼 있으면 직전 오류(없으면 CircuitOpen)를 올림
+        try:
+            result = call()
+        except Exception as e:
+            time.sleep(attempts.failed(n, e))  # 더 재시도하지 않으면 e를 올림
+            continue
+        attempts.succeeded()
+        return result
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.breaker = breaker(provider)
+        self.last_error: BaseException | None = None
+
+    def __iter__(self) -> Iterator[int]:
+        for n in range(MAX_RETRIES + 1):
+            self.check()
+            yield n
+
+    def check(self) -> None:
+        """서킷 브레이커가 막고 있으면 직전 오류(없으면 CircuitOpen)를 올립니다."""
+        if not self.breaker.allow():
+            # 재시도 중에 차단됐다면 실제 원인(직전 오류)을 그대로 올린다
+            raise self.last_error or CircuitOpen(
+                f"{self.provider} 호출이 잠시 차단되었습니다 (연속 실패)."
+            )
+
+    def record_failure(self, error: BaseException) -> None:
+        """재시도 없이 실패만 기록 (스트리밍 답변 도중의 실패 등)"""
+        self.last_error = error
+        if counts_as_failure(error):
+            self.breaker.failure()
+
+    def failed(self, attempt: int, error: BaseException) -> float:
+        """실패를 기록하고 다음 시도 전 대기 시간(초)을 반환합니다. 끝이면 error를 올림"""
+        self.record_failure(error)
+        if not is_retryable(error) or attempt == MAX_RETRIES:
+            raise error
+        return backoff_delay(attempt, error)
+
+    def succeeded(self) -> None:
+        self.breaker.success()
+
+
+def with_retries(provider: str, attempt_fn: Callable[[int], Any]) -> Any:
+    """attempt_fn(시도 번호)를 재시도 가능한 오류에 한해 백오프하며 반복합니다."""
+    attempts = Attempts(provider)
+    for n in attempts:
+        try:
+            result = attempt_fn(n)
+        except Exception as e:
+            time.sleep(attempts.failed(n, e))
+            continue
+        attempts.succeeded()
+        return result
+
+
+def hedged(primary: Callable[[], Any], backup: Callable[[], Any], delay: float) -> Any:
+    """primary가 delay초 안에 끝나지 않으면 backup도 시작해 먼저 성공한 결과를 반환합니다.
+
+    primary가 그 전에 실패하면 바로 backup을 호출합니다. 둘 다 실패하면 primary의 오류
+    (backup의 오류는 __context__로 남음).
+    """
+    first = _hedge_pool.submit(primary)
+    try:
+        return first.result(timeout=delay)
+    except FutureTimeout:
+        pass
+    except Exception as primary_error:
+        try:
+            return backup()
+        except Exception:
+            raise primary_error
+
+    second = _hedge_pool.submit(backup)
+    pending, errors = {first, second}, {}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            try:
+                return f.result()
+            except Exception as e:
+                errors[f] = e
+    raise errors[first]
+
+
+def stream_with_timeout(
+    make_stream: Callable[[], Iterator[str]],
+    first_timeout: float,
+    idle_timeout: float,
+    cancel: threading.Event | None = None,
+) -> Iterator[str]:
+    """스트림을 작업 스레드에서 읽어, 첫 조각은 first_timeout, 이후 조각 사이는 idle_timeout
+    안에 오지 않으면 CallTimeout을 냅니다.
+
+    cancel이 set되면(또는 이 제너레이터를 닫으면) 다음 조각이 도착하는 시점에 스트림을 닫아
+    HTTP 응답을 정리하고 끝냅니다. 조각을 기다리며 막혀 있는 읽기를 그 자리에서 끊지는
+    못하므로, 다음 조각(또는 HTTP 타임아웃)까지는 연결이 남아 있습니다.
+    """
+    chunks: queue.Queue = queue.Queue()
+    stop = threading.Event()
+
+    def produce():
+        stream = None
+        try:
+            stream = make_stream()
+            for chunk in stream:
+                if stop.is_set() or (cancel is not None and cancel.is_set()):
+                    break
+                chunks.put(("chunk", chunk))
+            chunks.put(("done", None))
+        except Exception as e:
+            chunks.put(("error", e))
+        finally:
+            # 도중에 그만둔 스트림도 GC를 기다리지 않고 바로 닫는다 (연결 반환)
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+    threading.Thread(target=produce, daemon=True, name="llm-stream").start()
+    timeout = first_timeout
+    try:
+        while True:
+            try:
+                kind, value = chunks.get(timeout=timeout)
+            except queue.Empty:
+                raise CallTimeout(
+                    f"{timeout:.0f}초 동안 응답 조각이 없었습니다."
+                ) from None
+            if kind == "chunk":
+                yield value
+                timeout = idle_timeout
+            elif kind == "error":
+                raise value
+            else:
+                return
+    finally:
+        stop.set()
@@ -0,0 +1,132 @@
+# lib/router.py
+# 키워드 기반 페르소나 라우터.
+# 각 프롬프트 YAML의 `router` 섹션(키워드별 가중치)을 모아 페르소나마다 정규식 하나로
+# 미리 컴파일하고, 줄 단위 점수를 캐시해 히스토리에서 반복되는 줄은 다시 훑지 않습니다.
+#
+# router:
+#   default: true            # 동점이고 직전 라우트도 없을 때 선택 (선택)
+#   override:                # 하나라도 걸리면 점수와 무관하게 이 페르소나 (예: 응급)
+#     keywords: [응급, 119]
+#     patterns: ['35(\.\d+)?°?이하']
+#   keywords: {수유: 1, 낮잠: 1}     # 글자 사이 공백은 무시 ("의식 소실" == "의식소실")
+#   patterns: {'\b개월\b': 1}        # 단어 경계 등 정규식이 필요한 경우만
+import functools
+import re
+from typing import Any, Dict, Iterable, List, Protocol, Tuple
+
+FALLBACK_PROMPT_ID = "parenting_expert_v1"
+MARGIN = 1.0  # 1위와 2위 점수 차가 이 이상이어야 라우트를 바꾼다
+
+
+def _norm(s: str) -> str:
+    return "".join(str(s).lower().split())
+
+
+def _compile(keywords: Iterable[str], patterns: Iterable[str]) -> re.Pattern | None:
+    """키워드(긴 것 우선)와 정규식을 하나의 alternation으로 묶습니다.
+
+    정규식은 (?P<_pN>...) 그룹으로 감싸 어떤 패턴이 걸렸는지 lastgroup으로 알 수 있게 한다.
+    """
+    literals = sorted({_norm(k) for k in keywords if _norm(k)}, key=len, reverse=True)
+    alts = [r"\s*".join(re.escape(ch) for ch in kw) for kw in literals]
+    alts += [f"(?P<_p{i}>{pat})" for i, pat in enumerate(patterns)]
+    return re.compile("|".join(alts), re.IGNORECASE) if alts else None
+
+
+class Router(Protocol):
+    """페르소나 라우터 공통 인터페이스 (KeywordRouter, semantic_router.SemanticRouter)"""
+
+    def select(
+        self, user_text: str, history_text: str = "", last_route: str | None = None
+    ) -> str: ...
+
+
+class KeywordRouter:
+    """프롬프트 목록의 router 설정으로 만든 라우터. select()가 페르소나 id를 고릅니다."""
+
+    def __init__(self, prompts: Iterable[Dict[str, Any]], cache_size: int = 4096):
+        # (prompt_id, override 정규식)
+        self._overrides: List[Tuple[str, re.Pattern]] = []
+        # (prompt_id, 점수 정규식, 키워드 가중치, 패턴 가중치)
+        self._scorers: List[Tuple[str, re.Pattern, Dict[str, float], List[float]]] = []
+        self.default_id = FALLBACK_PROMPT_ID
+
+        for p in prompts:
+            cfg = p.get("router") or {}
+            if not cfg:
+                continue
+            pid = p["id"]
+            if cfg.get("default"):
+                self.default_id = pid
+
+            override = cfg.get("override") or {}
+            rx = _compile(
+                override.get("keywords") or [], override.get("patterns") or []
+            )
+            if rx is not None:
+                self._overrides.append((pid, rx))
+
+            keywords = {
+                _norm(k): float(w) for k, w in (cfg.get("keywords") or {}).items()
+            }
+            patterns = cfg.get("patterns") or {}
+            rx = _compile(keywords, patterns)
+            if rx is not None:
+                self._scorers.append(
+                    (pid, rx, keywords, [float(w) for w in patterns.values()])
+                )
+
+        self._score_line = functools.lru_cache(maxsize=cache_size)(self._score_line)
+
+    def _score_line(
+        self, line: str
+    ) -> Tuple[str | None, Tuple[Tuple[str, float], ...]]:
+        """한 줄의 (override 페르소나 id 또는 None, 페르소나별 점수)"""
+        for pid, rx in self._overrides:
+            if rx.search(line):
+                return pid, ()
+
+        scores = []
+        for pid, rx, kw_weights, pat_weights in self._scorers:
+            score = 0.0
+            for m in rx.finditer(line):
+                if m.lastgroup:
+                    score += pat_weights[int(m.lastgroup[2:])]
+                else:
+                    score += kw_weights.get(_norm(m.group()), 0.0)
+            if score:
+                scores.append((pid, score))
+        return None, tuple(scores)
+
+    def scores(self, text: str) -> Tuple[str | None, Dict[str, float]]:
+        """텍스트 전체의 (override 페르소나 id 또는 None, 페르소나별 점수)"""
+        total: Dict[str, float] = {}
+        for line in text.split("\n"):
+            if not line.strip():
+                continue
+            override, line_scores = self._score_line(line)
+            if override:
+                return override, {}
+            for pid, score in line_scores:
+                total[pid] = total.get(pid, 0.0) + score
+        return None, total
+
+    def select(
+        self, user_text: str, history_text: str = "", last_route: str | None = None
+    ) -> str:
+        override, scores = self.scores(f"{history_text}\n{user_text}")
+
+        # 1) 응급 등 오버라이드
+        if override:
+            return override
+
+        # 2) 1위가 2위보다 MARGIN 이상 높을 때만 선택
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        if ranked:
+            top_id, top = ranked[0]
+            second = ranked[1][1] if len(ranked) > 1 else 0.0
+            if top - second >= MARGIN:
+                return top_id
+
+        # 3) 동점이면 직전 라우트 유지, 없으면 기본 페르소나
+        return last_route or self.default_id
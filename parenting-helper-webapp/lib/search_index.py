@@ -0,0 +1,237 @@
+# lib/search_index.py
+# 전체 대화/아카이브 전문 검색 인덱스 (SQLite FTS5).
+# 한글은 띄어쓰기가 일정하지 않아 한글 사이의 공백을 없앤 뒤 글자 bigram
+# ("밤중 수유" -> 밤중 중수 수유)으로 색인하고, 질의도 같은 방식으로 쪼개 구(phrase)
+# 검색을 합니다. 저장소가 저장할 때마다 새로 추가된 메시지만 색인합니다.
+import contextlib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+INDEX_PATH = os.environ.get("SEARCH_INDEX_PATH") or os.path.join(
+    DATA_DIR, "search_index.db"
+)
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+    body,
+    cid UNINDEXED,
+    seq UNINDEXED,
+    role UNINDEXED,
+    content UNINDEXED,
+    tokenize = 'unicode61'
+);
+CREATE TABLE IF NOT EXISTS indexed (
+    cid    TEXT PRIMARY KEY,
+    count  INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+"""
+
+# 색인 방식이 바뀌면 올린다 (다르면 인덱스를 비우고 다시 색인)
+_VERSION = 2
+
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+_HANGUL = re.compile(r"[가-힣]+|[^가-힣]+")
+_HANGUL_SPACE = re.compile(r"(?<=[가-힣])\s+(?=[가-힣])")
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+        _conn = sqlite3.connect(INDEX_PATH, check_same_thread=False, timeout=30)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        if _conn.execute("PRAGMA user_version").fetchone()[0] != _VERSION:
+            old = _conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'indexed'"
+            ).fetchone()
+            _conn.executescript(
+                "DROP TABLE IF EXISTS messages_fts; DROP TABLE IF EXISTS indexed;"
+            )
+            _conn.execute(f"PRAGMA user_version = {_VERSION}")
+            if old:
+                print(
+                    "검색 인덱스 형식이 바뀌어 새로 만듭니다."
+                    " (기존 대화: python scripts/build_search_index.py)"
+                )
+        _conn.executescript(_SCHEMA)
+    return _conn
+
+
+@contextlib.contextmanager
+def _tx() -> Iterator[sqlite3.Connection]:
+    """_lock을 잡고 쓰기 트랜잭션 하나. 실패하면 rollback해 반쯤 열린 트랜잭션을 남기지 않음"""
+    with _lock:
+        db = _db()
+        try:
+            yield db
+        except BaseException:
+            db.rollback()
+            raise
+        db.commit()
+
+
+def _runs(text: str) -> List[List[str]]:
+    """단어별 토큰 묶음. 한글 구간은 글자 bigram, 나머지는 소문자 단어 그대로.
+
+    한글 사이의 공백은 먼저 지우므로 "밤중 수유"와 "밤중수유"가 같은 bigram이 됩니다.
+    """
+    runs = []
+    for word in re.findall(r"\w+", _HANGUL_SPACE.sub("", text.lower())):
+        for part in _HANGUL.findall(word):
+            if "가" <= part[0] <= "힣" and len(part) > 1:
+                runs.append([part[i : i + 2] for i in range(len(part) - 1)])
+            else:
+                runs.append([part])
+    return runs
+
+
+def _body(text: str) -> str:
+    return " ".join(tok for run in _runs(text) for tok in run)
+
+
+def _query(text: str) -> str:
+    """FTS5 질의: 단어마다 bigram 구(phrase)로 묶어 AND. 한 글자는 접두 검색."""
+    terms = []
+    for run in _runs(text):
+        if len(run) == 1 and len(run[0]) == 1:
+            terms.append(f'"{run[0]}"*')
+        else:
+            terms.append('"' + " ".join(run) + '"')
+    return " AND ".join(terms)
+
+
+def _digest(m: Dict) -> str:
+    raw = json.dumps(m, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _rows(cid: str, messages: Iterable[Dict], start: int) -> Iterable[Tuple]:
+    for i, m in enumerate(messages, start=start):
+        if m.get("role") not in ("user", "assistant"):
+            continue
+        content = m.get("content", "")
+        yield (_body(content), cid, i, m.get("role"), content)
+
+
+def update_conversation(cid: str, messages: List[Dict]) -> None:
+    """대화 저장 시 호출. 이미 색인한 앞부분이 같으면 새 메시지만, 아니면 다시 색인합니다."""
+    try:
+        with _tx() as db:
+            row = db.execute(
+                "SELECT count, digest FROM indexed WHERE cid = ?", (cid,)
+            ).fetchone()
+            start = 0
+            if row and row[0] <= len(messages):
+                if row[0] == 0 or _digest(messages[row[0] - 1]) == row[1]:
+                    start = row[0]
+            if start == 0:
+                db.execute("DELETE FROM messages_fts WHERE cid = ?", (cid,))
+            db.executemany(
+                "INSERT INTO messages_fts (body, cid, seq, role, content)"
+                " VALUES (?, ?, ?, ?, ?)",
+                _rows(cid, messages[start:], start),
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO indexed (cid, count, digest) VALUES (?, ?, ?)",
+                (cid, len(messages), _digest(messages[-1]) if messages else ""),
+            )
+    except sqlite3.Error as e:
+        print(f"경고: 검색 인덱스 갱신 실패 ({cid}): {e}")
+
+
+def remove_conversation(cid: str) -> None:
+    try:
+        with _tx() as db:
+            db.execute("DELETE FROM messages_fts WHERE cid = ?", (cid,))
+            db.execute("DELETE FROM indexed WHERE cid = ?", (cid,))
+    except sqlite3.Error as e:
+        print(f"경고: 검색 인덱스 삭제 실패 ({cid}): {e}")
+
+
+def archive_id(path: str) -> str:
+    """아카이브 파일의 검색용 id (예: archive:chat-20250917-003403).
+
+    SQLite 백엔드로 옮긴 아카이브도 이 id를 대화 id로 씁니다 (scripts/migrate_to_sqlite.py).
+    """
+    return "archive:" + os.path.splitext(os.path.basename(path))[0]
+
+
+def index_archive(path: str, messages: Iterable[Dict]) -> str:
+    """내보낸 아카이브 파일을 색인하고 검색용 id를 반환합니다. (messages는 한 번만 훑음)
+
+    messages가 내보내기 스트림일 수 있으므로, 행은 잠금 밖에서 먼저 모은 뒤 한 번에 씁니다.
+    (그동안 검색/대화 색인이 내보내기 시간만큼 막히지 않도록)
+    """
+    cid = archive_id(path)
+    seen = {"count": 0, "last": None}
+
+    def counted():
+        for m in messages:
+            seen["count"] += 1
+            seen["last"] = m
+            yield m
+
+    rows = list(_rows(cid, counted(), 0))
+
+    try:
+        with _tx() as db:
+            db.execute("DELETE FROM messages_fts WHERE cid = ?", (cid,))
+            db.executemany(
+                "INSERT INTO messages_fts (body, cid, seq, role, content)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO indexed (cid, count, digest) VALUES (?, ?, ?)",
+                (cid, seen["count"], _digest(seen["last"]) if seen["last"] else ""),
+            )
+    except sqlite3.Error as e:
+        print(f"경고: 검색 인덱스 갱신 실패 ({cid}): {e}")
+    return cid
+
+
+def _snippet(content: str, query: str, width: int = 40) -> str:
+    words = [w for w in query.split() if w]
+    pos = -1
+    for w in words:
+        pos = content.lower().find(w.lower())
+        if pos >= 0:
+            break
+    pos = max(pos, 0)
+    start = max(0, pos - width)
+    end = pos + width * 2
+    text = content[start:end].replace("\n", " ")
+    return ("…" if start else "") + text + ("…" if end < len(content) else "")
+
+
+def search_conversations(query: str, limit: int = 20) -> List[Dict]:
+    """질의와 맞는 메시지를 관련도 순으로 반환합니다.
+
+    [{"cid", "seq", "role", "snippet"}] — 아카이브는 cid가 "archive:..." 형태
+    """
+    fts_query = _query(query)
+    if not fts_query:
+        return []
+    try:
+        with _lock:
+            cur = _db().execute(
+                "SELECT cid, seq, role, content FROM messages_fts"
+                " WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?",
+                (fts_query, limit),
+            )
+            rows = cur.fetchall()
+    except sqlite3.Error as e:
+        print(f"경고: 검색 실패: {e}")
+        return []
+    return [
+        {"cid": cid, "seq": seq, "role": role, "snippet": _snippet(content, query)}
+        for cid, seq, role, content in rows
+    ]
@@ -0,0 +1,145 @@
+# lib/semantic_router.py
+# 예문(exemplar) 기반 시맨틱 페르소나 라우터 (선택 기능, ROUTER_MODE=semantic).
+# 각 프롬프트 YAML의 router.exemplars 예문을 해시된 글자 n-gram 벡터로 임베딩해
+# 하나의 NumPy 행렬로 만들어 두고(data/cache/router_index.npz 에 캐시), 입력 문장과의
+# 코사인 유사도 한 번으로 페르소나를 고릅니다. 외부 모델/네트워크 없이 동작합니다.
+#
+# router:
+#   exemplars:
+#     - 요즘 너무 지쳐서 아무것도 못 하겠어요
+#     - 제가 엄마 자격이 있는 걸까요
+#
+# 응급 override는 항상 키워드 라우터가 먼저 판단하고, 유사도 차이가 작으면 키워드 라우터의
+# 점수 방식으로 넘깁니다.
+import functools
+import hashlib
+import json
+import os
+import zlib
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+from lib.router import KeywordRouter
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+INDEX_PATH = os.environ.get("ROUTER_INDEX_PATH") or os.path.join(
+    DATA_DIR, "cache", "router_index.npz"
+)
+
+DIM = 2048  # 해시 버킷 수
+NGRAMS = (1, 2, 3)  # 글자 n-gram (공백 제거 후)
+HISTORY_WEIGHT = 0.5  # 최근 사용자 턴 평균 벡터의 가중치
+MIN_SIMILARITY = 0.2  # 1위 유사도가 이보다 낮으면 판단 보류
+SIM_MARGIN = 0.05  # 1위와 2위 유사도 차가 이보다 작으면 판단 보류
+
+
+def _features(text: str) -> Dict[int, float]:
+    """글자 n-gram을 부호 있는 해시 버킷으로 (feature hashing)"""
+    s = "".join(str(text).lower().split())
+    vec: Dict[int, float] = {}
+    for n in NGRAMS:
+        for i in range(len(s) - n + 1):
+            h = zlib.crc32(f"{n}:{s[i : i + n]}".encode("utf-8"))
+            idx = h % DIM
+            vec[idx] = vec.get(idx, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+    return vec
+
+
+def embed(text: str) -> np.ndarray:
+    """L2 정규화된 float32 벡터 (빈 문자열이면 0 벡터)"""
+    v = np.zeros(DIM, dtype=np.float32)
+    for idx, val in _features(text).items():
+        v[idx] = val
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+def _fingerprint(items: List[tuple]) -> str:
+    raw = json.dumps([DIM, NGRAMS, items], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _build_index(items: List[tuple]) -> np.ndarray:
+    """(prompt_id, 예문) 목록의 임베딩 행렬. 디스크 캐시가 같은 예문이면 그대로 읽는다."""
+    key = _fingerprint(items)
+    try:
+        with np.load(INDEX_PATH) as cached:
+            if str(cached["key"]) == key:
+                return cached["matrix"]
+    except (OSError, KeyError, ValueError):
+        pass
+
+    matrix = np.stack([embed(text) for _, text in items]).astype(np.float32)
+    try:
+        os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+        tmp = f"{INDEX_PATH}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp, key=np.array(key), matrix=matrix)
+        os.replace(tmp, INDEX_PATH)
+    except OSError as e:
+        print(f"경고: 라우터 인덱스 저장 실패: {e}")
+    return matrix
+
+
+class SemanticRouter:
+    """KeywordRouter와 같은 select() 인터페이스. 예문이 없으면 키워드 라우터와 동일."""
+
+    def __init__(self, prompts: Iterable[Dict[str, Any]], cache_size: int = 4096):
+        prompts = list(prompts)
+        self.keyword = KeywordRouter(prompts, cache_size=cache_size)
+        self.default_id = self.keyword.default_id
+
+        items = []
+        for p in prompts:
+            for text in (p.get("router") or {}).get("exemplars") or []:
+                items.append((p["id"], str(text)))
+        # 페르소나별로 연속되게 정렬해 두면 reduceat 한 번으로 페르소나별 최댓값
+        items.sort(key=lambda x: x[0])
+        self.ids: List[str] = []
+        starts = []
+        for i, (pid, _) in enumerate(items):
+            if not self.ids or self.ids[-1] != pid:
+                self.ids.append(pid)
+                starts.append(i)
+        self._starts = np.array(starts, dtype=np.intp)
+        self._matrix = _build_index(items) if items else None
+
+        # 같은 줄(히스토리에서 반복되는 사용자 턴)은 다시 임베딩하지 않는다
+        self._embed_line = functools.lru_cache(maxsize=cache_size)(embed)
+
+    def similarities(self, user_text: str, history_text: str = "") -> Dict[str, float]:
+        """페르소나별 최고 예문 유사도"""
+        if self._matrix is None:
+            return {}
+        q = self._embed_line(user_text)
+        # 히스토리에는 이번 입력("[아기 N개월]\n질문")도 줄 단위로 들어 있으므로 그 줄들은 뺀다
+        own = set(user_text.split("\n"))
+        lines = [
+            line
+            for line in history_text.split("\n")
+            if line.strip() and line not in own
+        ]
+        if lines:
+            hist = np.mean([self._embed_line(line) for line in lines], axis=0)
+            q = q + HISTORY_WEIGHT * hist
+            norm = np.linalg.norm(q)
+            q = q / norm if norm else q
+        sims = np.maximum.reduceat(self._matrix @ q, self._starts)
+        return dict(zip(self.ids, sims.tolist()))
+
+    def select(
+        self, user_text: str, history_text: str = "", last_route: str | None = None
+    ) -> str:
+        override, _ = self.keyword.scores(f"{history_text}\n{user_text}")
+        if override:
+            return override
+
+        ranked = sorted(
+            self.similarities(user_text, history_text).items(),
+            key=lambda x: x[1],
+            reverse=True,
+        )
+        if ranked and ranked[0][1] >= MIN_SIMILARITY:
+            second = ranked[1][1] if len(ranked) > 1 else 0.0
+            if ranked[0][1] - second >= SIM_MARGIN:
+                return ranked[0][0]
+        return self.keyword.select(user_text, history_text, last_route=last_route)
@@ -0,0 +1,262 @@
+# lib/sqlite_storage.py (SQLite 백엔드: WAL 모드, 메시지 단위 행)
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Dict, Iterator, List
+
+from lib import export, search_index
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+DB_PATH = os.environ.get("STORAGE_SQLITE_PATH") or os.path.join(
+    DATA_DIR, "conversations.db"
+)
+os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id           TEXT PRIMARY KEY,
+    title        TEXT NOT NULL,
+    created_at   TEXT NOT NULL,
+    updated_at   TEXT NOT NULL,
+    last_preview TEXT NOT NULL DEFAULT '',
+    archived     INTEGER NOT NULL DEFAULT 0,
+    source       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated
+    ON conversations (archived, updated_at DESC);
+
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+    seq             INTEGER NOT NULL,
+    role            TEXT NOT NULL,
+    content         TEXT NOT NULL,
+    ts              TEXT,
+    data            TEXT NOT NULL,  -- 원본 메시지 dict(JSON). load 시 그대로 복원
+    digest          TEXT NOT NULL,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+"""
+
+# Streamlit 세션은 스레드로 돌기 때문에 연결은 스레드마다 하나씩 둡니다.
+_local = threading.local()
+
+
+def _now_iso():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+@contextlib.contextmanager
+def _tx() -> Iterator[sqlite3.Connection]:
+    """쓰기 트랜잭션. BEGIN IMMEDIATE로 쓰기 잠금을 먼저 잡아 세션 간 덮어쓰기를 막는다."""
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _digest(m: Dict) -> str:
+    raw = json.dumps(m, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _preview(messages: List[Dict]) -> str:
+    for m in reversed(messages):
+        if m.get("role") == "user":
+            return m.get("content", "").replace("\n", " ")[:80]
+    return ""
+
+
+def _insert_messages(
+    conn: sqlite3.Connection, cid: str, messages: List[Dict], start: int = 0
+) -> None:
+    conn.executemany(
+        "INSERT INTO messages (conversation_id, seq, role, content, ts, data, digest)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                cid,
+                start + i,
+                m.get("role", ""),
+                m.get("content", ""),
+                m.get("ts"),
+                json.dumps(m, ensure_ascii=False),
+                _digest(m),
+            )
+            for i, m in enumerate(messages)
+        ],
+    )
+
+
+@contextlib.contextmanager
+def batch_index_updates() -> Iterator[None]:
+    """파일 백엔드와의 API 호환용. SQLite는 행 단위로 갱신하므로 따로 모을 필요가 없습니다."""
+    yield
+
+
+def list_conversations(
+    offset: int = 0, limit: int | None = None, before_updated_at: str | None = None
+) -> List[Dict]:
+    """최근 수정 순 대화 목록. limit/offset 또는 before_updated_at(이 시각보다 이전)으로
+    한 페이지만 가져올 수 있습니다. (archived, updated_at) 인덱스를 탑니다."""
+    sql = (
+        "SELECT id, title, updated_at, last_preview FROM conversations"
+        " WHERE archived = 0"
+    )
+    params: list = []
+    if before_updated_at is not None:
+        sql += " AND updated_at < ?"
+        params.append(before_updated_at)
+    sql += " ORDER BY updated_at DESC, rowid DESC LIMIT ? OFFSET ?"
+    params += [-1 if limit is None else limit, offset]
+    return [dict(r) for r in _conn().execute(sql, params)]
+
+
+def get_conversation_meta(cid: str) -> Dict | None:
+    """대화 하나의 메타데이터(id/title/updated_at/last_preview). 없으면 None"""
+    cur = _conn().execute(
+        "SELECT id, title, updated_at, last_preview FROM conversations WHERE id = ?",
+        (cid,),
+    )
+    row = cur.fetchone()
+    return dict(row) if row else None
+
+
+def create_conversation(title: str = "새 대화") -> str:
+    cid = uuid.uuid4().hex[:12]
+    now = _now_iso()
+    with _tx() as conn:
+        conn.execute(
+            "INSERT INTO conversations (id, title, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?)",
+            (cid, title, now, now),
+        )
+    return cid
+
+
+def load_conversation(cid: str) -> List[Dict]:
+    rows = _conn().execute(
+        "SELECT data FROM messages WHERE conversation_id = ? ORDER BY seq", (cid,)
+    )
+    return [json.loads(r["data"]) for r in rows]
+
+
+def iter_messages(cid: str) -> Iterator[Dict]:
+    """메시지를 한 건씩 (커서로 읽어 대화 전체를 메모리에 올리지 않음)"""
+    rows = _conn().execute(
+        "SELECT data FROM messages WHERE conversation_id = ? ORDER BY seq", (cid,)
+    )
+    for r in rows:
+        yield json.loads(r["data"])
+
+
+def save_conversation(cid: str, messages: List[Dict]) -> None:
+    """이미 저장된 앞부분이 같으면 새 메시지 행만 추가하고, 어긋나면 전체를 다시 씁니다."""
+    with _tx() as conn:
+        now = _now_iso()
+        conn.execute(
+            "INSERT INTO conversations"
+            " (id, title, created_at, updated_at, last_preview)"
+            " VALUES (?, '새 대화', ?, ?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET"
+            " updated_at = excluded.updated_at, last_preview = excluded.last_preview",
+            (cid, now, now, _preview(messages)),
+        )
+
+        row = conn.execute(
+            "SELECT seq, digest FROM messages WHERE conversation_id = ?"
+            " ORDER BY seq DESC LIMIT 1",
+            (cid,),
+        ).fetchone()
+        count = row["seq"] + 1 if row else 0
+        if count <= len(messages) and (
+            count == 0 or _digest(messages[count - 1]) == row["digest"]
+        ):
+            _insert_messages(conn, cid, messages[count:], start=count)
+        else:
+            conn.execute("DELETE FROM messages WHERE conversation_id = ?", (cid,))
+            _insert_messages(conn, cid, messages)
+    search_index.update_conversation(cid, messages)
+
+
+def rename_conversation(cid: str, new_title: str) -> bool:
+    with _tx() as conn:
+        cur = conn.execute(
+            "UPDATE conversations SET title = ?, updated_at = ? WHERE id = ?",
+            (new_title, _now_iso(), cid),
+        )
+    return cur.rowcount > 0
+
+
+def delete_conversation(cid: str) -> bool:
+    """대화와 메시지 행 삭제(메시지는 ON DELETE CASCADE)"""
+    with _tx() as conn:
+        conn.execute("DELETE FROM conversations WHERE id = ?", (cid,))
+    search_index.remove_conversation(cid)
+    return True
+
+
+def export_conversation(cid: str, export_dir: str | None = None) -> str:
+    """data/archive/chat-YYYYMMDD-HHMMSS-xxxxxxxx.json 형태로 내보내기 (lib/export.py)"""
+    # 파일에 쓰는 메시지를 그대로 색인에도 넘겨 대화는 한 번만 읽는다
+    return export.export_messages(
+        iter_messages(cid),
+        export_dir or os.path.join(DATA_DIR, "archive"),
+        index=search_index.index_archive,
+    )
+
+
+# === 마이그레이션 도구(scripts/migrate_to_sqlite.py)용 ===
+def import_conversation(
+    cid: str,
+    title: str,
+    messages: List[Dict],
+    updated_at: str | None = None,
+    archived: bool = False,
+    source: str | None = None,
+) -> None:
+    """대화 하나를 통째로 넣습니다. 같은 id가 있으면 덮어쓰므로 여러 번 실행해도 안전합니다."""
+    updated_at = updated_at or _now_iso()
+    with _tx() as conn:
+        conn.execute("DELETE FROM messages WHERE conversation_id = ?", (cid,))
+        conn.execute(
+            "INSERT INTO conversations"
+            " (id, title, created_at, updated_at, last_preview, archived, source)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET title = excluded.title,"
+            " updated_at = excluded.updated_at, last_preview = excluded.last_preview,"
+            " archived = excluded.archived, source = excluded.source",
+            (
+                cid,
+                title,
+                updated_at,
+                updated_at,
+                _preview(messages),
+                int(archived),
+                source,
+            ),
+        )
+        _insert_messages(conn, cid, messages)
+    search_index.update_conversation(cid, messages)
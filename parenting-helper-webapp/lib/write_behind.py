@@ -0,0 +1,134 @@
+# lib/write_behind.py
+# 대화 저장 write-behind 큐.
+# 채팅 턴은 save_conversation()으로 최신 메시지 스냅샷만 넘기고 바로 진행하며, 실제 파일/인덱스
+# 쓰기(lib/storage.py)는 백그라운드 스레드 하나가 합니다.
+# - 같은 대화의 저장이 밀려 있으면 마지막 스냅샷 하나로 합쳐(coalesce) 한 번만 씀
+# - 큐는 크기 제한이 있어, 디스크가 계속 느리면 저장 요청이 잠시 기다림 (메모리 무한 증가 방지)
+# - 한 번에 꺼낸 저장들은 batch_index_updates()로 묶어 index.json 쓰기도 1회
+# - 아직 쓰이지 않은 대화는 load_conversation()이 메모리의 스냅샷을 돌려줌
+# - flush(): 밀린 저장이 모두 끝날 때까지 대기 (종료 시 atexit으로 자동 호출)
+# WRITE_BEHIND=0 이면 예전처럼 호출한 자리에서 바로 저장합니다.
+import atexit
+import copy
+import os
+import queue
+import threading
+from typing import Dict, List
+
+from lib import storage
+
+ENABLED = os.environ.get("WRITE_BEHIND", "1") != "0"
+QUEUE_SIZE = int(os.environ.get("WRITE_BEHIND_QUEUE", 64))
+SHUTDOWN_TIMEOUT = 10.0  # 종료 시 밀린 저장을 기다리는 최대 시간(초)
+
+_queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+_lock = threading.Lock()
+_idle = threading.Condition(_lock)
+_latest: Dict[str, List[Dict]] = {}  # cid -> 아직 디스크에 쓰이지 않은 최신 스냅샷
+_queued: set = set()  # 큐에 들어 있는 cid (같은 cid는 큐에 한 번만)
+_writing: set = set()  # 지금 storage에 쓰는 중인 cid (discard 후에도 끝날 때까지 남음)
+_worker: threading.Thread | None = None
+
+
+def _ensure_worker() -> None:
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_run, daemon=True, name="conversation-writer"
+            )
+            _worker.start()
+
+
+def _write(cid: str) -> None:
+    with _idle:
+        _queued.discard(cid)
+        messages = _latest.get(cid)
+        if messages is None:  # discard()로 취소됨
+            _idle.notify_all()
+            return
+        _writing.add(cid)
+    try:
+        storage.save_conversation(cid, messages)
+    except Exception as e:
+        # 세션에는 메시지가 남아 있고 다음 저장이 전체를 다시 쓰므로 경고만 남긴다
+        print(f"경고: 대화 저장 실패 ({cid}): {e}")
+    finally:
+        with _idle:
+            # 쓰는 동안 더 새 스냅샷이 들어왔다면 남겨 둔다 (곧 다시 큐에서 나옴)
+            if _latest.get(cid) is messages:
+                del _latest[cid]
+            _writing.discard(cid)
+            _idle.notify_all()
+
+
+def _run() -> None:
+    while True:
+        cids = [_queue.get()]
+        # 이미 밀려 있는 저장까지 한꺼번에 꺼내 인덱스 쓰기를 묶는다
+        while True:
+            try:
+                cids.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        with storage.batch_index_updates():
+            for cid in cids:
+                _write(cid)
+        for _ in cids:
+            _queue.task_done()
+
+
+def save_conversation(cid: str, messages: List[Dict]) -> None:
+    """대화 저장을 예약합니다. messages는 호출 시점의 스냅샷으로 저장됩니다."""
+    if not ENABLED:
+        storage.save_conversation(cid, messages)
+        return
+    snapshot = copy.deepcopy(messages)  # 중첩된 값까지 호출 시점 그대로
+    with _lock:
+        _latest[cid] = snapshot
+        if cid in _queued:
+            return  # 아직 쓰지 않은 저장과 합쳐짐
+        _queued.add(cid)
+    _ensure_worker()
+    _queue.put(cid)
+
+
+def load_conversation(cid: str) -> List[Dict]:
+    """저장이 밀려 있는 대화는 메모리의 최신 스냅샷을, 아니면 저장소에서 읽습니다."""
+    with _lock:
+        snapshot = _latest.get(cid)
+    if snapshot is not None:
+        return copy.deepcopy(snapshot)
+    return storage.load_conversation(cid)
+
+
+def discard(cid: str) -> None:
+    """아직 쓰지 않은 저장을 취소합니다. (삭제 전에 호출 후 flush)
+
+    이미 쓰는 중인 저장은 멈출 수 없으므로, flush()가 그 저장이 끝날 때까지 기다립니다.
+    """
+    with _idle:
+        _latest.pop(cid, None)
+        _idle.notify_all()
+
+
+def pending() -> int:
+    """아직 디스크에 쓰이지 않은 대화 수"""
+    with _lock:
+        return len(_latest)
+
+
+def flush(timeout: float | None = None) -> bool:
+    """밀린 저장이 모두 끝날 때까지 기다립니다. 시간 안에 끝나면 True"""
+    with _idle:
+        return _idle.wait_for(
+            lambda: not _latest and not _queued and not _writing, timeout
+        )
+
+
+def _flush_at_exit() -> None:
+    if not flush(SHUTDOWN_TIMEOUT):
+        print(f"경고: 종료 전에 저장하지 못한 대화가 있습니다 ({pending()}개).")
+
+
+atexit.register(_flush_at_exit)
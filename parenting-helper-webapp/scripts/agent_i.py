@@ -1,9 +1,18 @@
 # scripts/agent_i.py (리팩토링 최종 완료)
 import argparse
+import hashlib
+import itertools
+import json
 import os
+import re
 import sys
 import textwrap
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+import yaml
 from dotenv import load_dotenv
 
 # --- 'lib' 디렉터리의 모듈을 가져오기 위한 경로 설정 ---
@@ -12,37 +21,36 @@ dotenv_path = os.path.join(webapp_root, ".env")
 load_dotenv(dotenv_path)
 sys.path.append(webapp_root)
 
-# --- 4개의 LLM 클라이언트 임포트 ---
-from lib.anthropic_client import get_completion as anthropic_completion
-from lib.deepseek_client import get_completion as deepseek_completion
-from lib.gemini_client import get_completion as gemini_completion
-from lib.openai_client import get_completion as openai_completion
+# --- LLM 프로바이더 레지스트리 (SDK 클라이언트는 첫 호출 때 생성) ---
+from lib.providers import get_completion
+from lib.replay import RateLimiter, iter_user_turns
 
+# debate 모드에서 모델 하나를 기다리는 최대 시간(초)
+DEFAULT_MODEL_TIMEOUT = 120
+# eval 모드 결과 기본 저장 위치
+EVAL_DIR = os.path.join(webapp_root, "data", "eval")
+# propose-batch 모드 수정안/요약 저장 위치 (data/proposals/<페르소나 id>/)
+PROPOSALS_DIR = os.path.join(webapp_root, "data", "proposals")
 
-def call_llm_by_name(model_name: str, messages: list):
+
+def call_llm_by_name(
+    model_name: str, messages: list, use_cache: bool = True, fallback: bool = True
+):
     """모델 이름에 따라 적절한 클라이언트를 호출하는 라우터 함수"""
     print(f" M 모델 호출: {model_name}...")
-
-    # 모델 이름에 따라 적절한 함수를 매핑
-    if "gpt" in model_name.lower() or "openai" in model_name.lower():
-        return openai_completion(messages)
-    elif "claude" in model_name.lower():
-        return anthropic_completion(messages)
-    elif "gemini" in model_name.lower():
-        return gemini_completion(messages)
-    elif "deepseek" in model_name.lower():
-        return deepseek_completion(messages)
-    else:
-        # 알 수 없는 모델명이면 기본값(OpenAI)으로 호출
-        print(
-            f"경고: 알 수 없는 모델 '{model_name}'. 기본값인 OpenAI GPT-4o-mini로 호출합니다."
-        )
-        return openai_completion(messages)
+    # 모델 이름 → 프로바이더 매핑과 알 수 없는 모델의 기본값 처리는 lib/providers.py
+    # 같은 입력의 반복 호출은 응답 캐시(lib/llm_cache.py)에서 바로 반환
+    # 타임아웃/백오프 재시도/서킷 브레이커는 항상 적용되고, fallback=True면 실패 시
+    # 대체 체인(gpt-4o-mini → deepseek-chat → claude haiku)의 다른 모델이 답합니다.
+    return get_completion(model_name, messages, use_cache=use_cache, fallback=fallback)
 
 
 # --- [수정됨] 함수가 인자를 개별적으로 받도록 변경 ---
-def handle_debug_mode(persona_path, user_input, bad_output, model_name):
-    """'debug' 모드의 핵심 로직. 진단 리포트를 '반환'합니다."""
+def handle_debug_mode(persona_path, user_input, bad_output, model_name, fallback=False):
+    """'debug' 모드의 핵심 로직. 진단 리포트를 '반환'합니다.
+
+    고른 모델의 진단이어야 하므로 기본으로 다른 모델로 대체하지 않습니다.
+    """
     print(f"🕵️  'debug' 모드 실행... {model_name}이 원인 진단을 시작합니다.")
     try:
         with open(persona_path, "r", encoding="utf-8") as f:
@@ -67,7 +75,7 @@ def handle_debug_mode(persona_path, user_input, bad_output, model_name):
         {"role": "user", "content": user_prompt},
     ]
 
-    diagnosis_report = call_llm_by_name(model_name, messages)
+    diagnosis_report = call_llm_by_name(model_name, messages, fallback=fallback)
     return diagnosis_report
 
 
@@ -81,6 +89,18 @@ def handle_propose_mode(goal, target_path, model_name):
     except FileNotFoundError:
         return f"❌ 오류: 대상 파일을 찾을 수 없습니다 -> {target_path}", None
 
+    # 고른 모델의 수정안이어야 하므로 다른 모델로 대체하지 않는다
+    proposed_content = call_llm_by_name(
+        model_name, _propose_messages(goal, original_content), fallback=False
+    )
+    output_path = target_path + ".proposed"
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(proposed_content)
+
+    return proposed_content, output_path
+
+
+def _propose_messages(goal, original_content):
     system_prompt = """
     당신은 YAML 형식의 LLM 프롬프트 파일을 수정하는 전문 AI입니다.
     사용자의 '수정 목표'와 '원본 YAML 파일 내용'을 바탕으로, 목표를 가장 잘 달성할 수 있는 새로운 YAML 파일 내용을 생성해야 합니다.
@@ -93,74 +113,598 @@ def handle_propose_mode(goal, target_path, model_name):
     user_prompt = (
         f"[수정 목표]\n{goal}\n\n[원본 YAML 파일 내용]\n---\n{original_content}\n---"
     )
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt},
     ]
 
-    proposed_content = call_llm_by_name(model_name, messages)
-    output_path = target_path + ".proposed"
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(proposed_content)
 
-    return proposed_content, output_path
-
-
-def handle_debate_mode(args):
-    """'debate' 모드. 여러 모델의 진단을 받고 교차 검증을 수행합니다."""
-    print("🤖 'debate' 모드 실행... 전문가 패널 토론을 시작합니다.")
+def _iter_parallel(jobs: dict, timeout: float):
+    """{키: (함수, 인자...)}를 동시에 실행하고 끝나는 순서대로 (키, 결과, 걸린 초)를 냅니다.
 
-    # --- 1. 개별 의견 취합 ---
-    initial_reports = {}
-    print("\n--- [1단계: 개별 진단 리포트 취합] ---")
-    # 참고: 실제 구현에서는 이 부분을 비동기(asyncio)나 멀티스레딩으로 처리하면 더 빠릅니다.
-    for model_name in args.models:
-        print(f"\n>> {model_name} 코치에게 진단 요청...")
-        report = handle_debug_mode(args.persona, args.input, args.output, model_name)
-        initial_reports[model_name] = report
-
-    # --- 2. 교차 검증 및 최종 보고서 생성 ---
+    timeout(초) 안에 끝나지 않은 작업은 기다리지 않고 시간 초과 메시지로 채웁니다.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, len(jobs)))
+    futures = {
+        executor.submit(fn, *fn_args): key for key, (fn, *fn_args) in jobs.items()
+    }
+    started = time.monotonic()
+    deadline = started + timeout
+    pending = set(futures)
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(
+                pending, timeout=remaining, return_when=FIRST_COMPLETED
+            )
+            for fut in done:
+                key = futures[fut]
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    result = f"❌ 오류: {key} 호출 중 예외가 발생했습니다: {e}"
+                yield key, result, round(time.monotonic() - started, 1)
+        for fut in pending:
+            message = f"⏱️ 시간 초과: {timeout:.0f}초 안에 응답이 없었습니다."
+            yield futures[fut], message, round(time.monotonic() - started, 1)
+    finally:
+        # 느린 호출은 백그라운드에서 끝나도록 두고 기다리지 않는다
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _is_failed(report: str) -> bool:
+    return report.startswith(("❌", "⏱️", "오류:"))
+
+
+def format_debate_report(result: dict) -> str:
+    """handle_debate_mode 결과를 마크다운 보고서로"""
     final_report = "## 🤖 Agent I 최종 토론 보고서\n\n"
     final_report += "### 1. 개별 진단 리포트\n\n"
 
-    for model_name, report in initial_reports.items():
+    for model_name, report in result["reports"].items():
         final_report += f"#### 📄 **진단 by {model_name}**\n"
         final_report += textwrap.indent(report, "> ") + "\n\n"
 
-    # 교차 검증 (가장 첫 번째 리포트를 기준으로 다른 모델들에게 비평 요청)
-    if len(args.models) > 1:
-        final_report += "### 2. 교차 검증 (Cross-Examination)\n\n"
+    if len(result["models"]) < 2:
+        return final_report
+    final_report += "### 2. 교차 검증 (Cross-Examination)\n\n"
+    base_model = result["base_model"]
+    if base_model is None:
+        final_report += (
+            "> 정상적으로 응답한 진단 리포트가 없어 교차 검증을 건너뜁니다.\n\n"
+        )
+        return final_report
 
-        base_model = args.models[0]
-        base_report = initial_reports[base_model]
-        critique_models = args.models[1:]
+    final_report += f"#### 🎯 **주요 검토 대상: {base_model}의 진단**\n"
+    final_report += textwrap.indent(result["reports"][base_model], "> ") + "\n\n"
+    for critique_model, critique in result["critiques"].items():
+        final_report += f"#### 💬 **비평 by {critique_model}**\n"
+        final_report += textwrap.indent(critique, "> ") + "\n\n"
+    return final_report
+
+
+def iter_debate(args):
+    """'debate' 모드를 이벤트 스트림으로 실행합니다. 모델별 진단/비평이 도착하는 대로 냅니다.
 
-        final_report += f"#### 🎯 **주요 검토 대상: {base_model}의 진단**\n"
-        final_report += textwrap.indent(base_report, "> ") + "\n\n"
+    {"type": "stage", "stage": "diagnosis"|"critique", "models", "base_model"}
+    {"type": "report", "stage", "model", "text", "ok", "seconds"}  (단계 시작부터 걸린 초)
+    {"type": "done", "result": handle_debate_mode 반환값과 같은 dict}
+    """
+    timeout = getattr(args, "timeout", None) or DEFAULT_MODEL_TIMEOUT
+
+    # --- 1. 개별 의견 취합 (모든 모델 동시 호출) ---
+    yield {
+        "type": "stage",
+        "stage": "diagnosis",
+        "models": list(args.models),
+        "base_model": None,
+    }
+    initial_reports = {}
+    for model_name, report, seconds in _iter_parallel(
+        {
+            model_name: (
+                handle_debug_mode,
+                args.persona,
+                args.input,
+                args.output,
+                model_name,
+                False,  # 모델별 의견을 비교하므로 다른 모델로 대체하지 않음
+            )
+            for model_name in args.models
+        },
+        timeout,
+    ):
+        initial_reports[model_name] = report
+        yield {
+            "type": "report",
+            "stage": "diagnosis",
+            "model": model_name,
+            "text": report,
+            "ok": not _is_failed(report),
+            "seconds": seconds,
+        }
+    # 완료 순서와 무관하게 입력한 모델 순서로 정렬
+    initial_reports = {m: initial_reports[m] for m in args.models}
+    result = {
+        "models": list(args.models),
+        "reports": initial_reports,
+        "base_model": None,
+        "critiques": {},
+    }
+
+    # --- 2. 교차 검증 (정상 응답한 첫 번째 리포트를 기준으로 다른 모델들에게 비평 요청) ---
+    succeeded = [m for m in args.models if not _is_failed(initial_reports[m])]
+    if len(args.models) > 1 and succeeded:
+        base_model = succeeded[0]
+        base_report = initial_reports[base_model]
+        critique_models = [m for m in args.models if m != base_model]
 
         critique_system_prompt = """
         당신은 다른 AI의 분석을 날카롭게 비평하는 '수석 분석가'입니다.
         아래에 제시된 [다른 AI의 진단 리포트]를 읽고, 그 진단의 논리적 허점, 놓치고 있는 부분, 또는 더 나은 대안이 있다면 무엇인지 비평해 주세요.
         비평은 간결하고 핵심만 짚어야 합니다.
         """
-
-        for critique_model in critique_models:
+        critique_user_prompt = f"[다른 AI의 진단 리포트]\n---\n{base_report}"
+        messages = [
+            {"role": "system", "content": critique_system_prompt},
+            {"role": "user", "content": critique_user_prompt},
+        ]
+
+        yield {
+            "type": "stage",
+            "stage": "critique",
+            "models": critique_models,
+            "base_model": base_model,
+        }
+        critiques = {}
+        for m, critique, seconds in _iter_parallel(
+            {m: (call_llm_by_name, m, messages, True, False) for m in critique_models},
+            timeout,
+        ):
+            critiques[m] = critique
+            yield {
+                "type": "report",
+                "stage": "critique",
+                "model": m,
+                "text": critique,
+                "ok": not _is_failed(critique),
+                "seconds": seconds,
+            }
+        result["base_model"] = base_model
+        result["critiques"] = {m: critiques[m] for m in critique_models}
+
+    result["report"] = format_debate_report(result)
+    yield {"type": "done", "result": result}
+
+
+def handle_debate_mode(args, on_event=None):
+    """'debate' 모드. 여러 모델의 진단을 받고 교차 검증을 수행합니다.
+
+    결과를 dict로 반환합니다:
+    {"models", "reports": {모델: 진단}, "base_model", "critiques": {모델: 비평}, "report"}
+    on_event(이벤트)가 있으면 iter_debate의 단계/리포트 이벤트를 도착하는 대로 넘깁니다.
+    """
+    print("🤖 'debate' 모드 실행... 전문가 패널 토론을 시작합니다.")
+    for event in iter_debate(args):
+        if event["type"] == "done":
+            print("\n" + "=" * 20 + " 토론 완료 " + "=" * 20)
+            return event["result"]
+        if event["type"] == "stage" and event["stage"] == "diagnosis":
+            print("\n--- [1단계: 개별 진단 리포트 취합] ---")
+            print(f"\n>> {', '.join(event['models'])} 코치에게 동시에 진단 요청...")
+        elif event["type"] == "stage":
             print(
-                f"\n>> {critique_model} 코치에게 {base_model}의 진단에 대한 비평 요청..."
+                f"\n>> {', '.join(event['models'])} 코치에게"
+                f" {event['base_model']}의 진단에 대한 비평을 동시에 요청..."
             )
-            critique_user_prompt = f"[다른 AI의 진단 리포트]\n---\n{base_report}"
-            messages = [
-                {"role": "system", "content": critique_system_prompt},
-                {"role": "user", "content": critique_user_prompt},
-            ]
-            critique = call_llm_by_name(critique_model, messages)
-            final_report += f"#### 💬 **비평 by {critique_model}**\n"
-            final_report += textwrap.indent(critique, "> ") + "\n\n"
+        else:
+            mark = "✅" if event["ok"] else "⚠️"
+            title = "진단" if event["stage"] == "diagnosis" else "비평"
+            print(f"   {mark} {event['model']} {title} 도착 ({event['seconds']}초)")
+        if on_event:
+            on_event(event)
+
+
+def _eval_case(case, system_msg, model_name, limiter, use_cache):
+    """사용자 턴 하나를 페르소나+모델로 다시 실행하고 결과 행을 반환합니다."""
+    limiter.wait()
+    messages = [system_msg, {"role": "user", "content": case["input"]}]
+    started = time.perf_counter()
+    try:
+        # 특정 모델을 평가하므로 대체 모델로 넘어가지 않는다
+        output = get_completion(
+            model_name, messages, use_cache=use_cache, fallback=False
+        )
+    except Exception as e:
+        output = f"오류: {e}"
+    return dict(
+        case,
+        output=output,
+        error=_is_failed(output),
+        latency_ms=round((time.perf_counter() - started) * 1000, 1),
+    )
+
+
+def _eval_done(path, persona_sha, model_name):
+    """이미 성공한 case_id (재개용). 페르소나 내용이나 모델이 바뀐 행은 제외"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 중단되며 잘린 마지막 줄
+            if (
+                row.get("persona_sha") == persona_sha
+                and row.get("model") == model_name
+                and not row.get("error")
+            ):
+                done.add(row["case_id"])
+    return done
+
+
+def _write_parquet(jsonl_path):
+    try:
+        import pandas as pd
+
+        out = os.path.splitext(jsonl_path)[0] + ".parquet"
+        pd.read_json(jsonl_path, lines=True).to_parquet(out, index=False)
+        return out
+    except ImportError:
+        print("⚠️ Parquet 저장에는 pandas와 pyarrow가 필요합니다. JSONL만 저장했습니다.")
+        return None
+
+
+def handle_eval_mode(args):
+    """'eval' 모드. 저장된 모든 사용자 턴을 페르소나+모델로 다시 돌려 결과를 JSONL로 남깁니다.
+
+    결과 파일이 체크포인트를 겸해서, 같은 명령을 다시 실행하면 끝난 턴은 건너뜁니다.
+    (실패한 턴은 다시 시도하며, 같은 case_id가 여러 번 있으면 마지막 행이 최신)
+    """
+    try:
+        with open(args.persona, "r", encoding="utf-8") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return f"❌ 오류: 페르소나 파일을 찾을 수 없습니다 -> {args.persona}"
+    persona = yaml.safe_load(raw) or {}
+    persona_id = (
+        persona.get("id") or os.path.splitext(os.path.basename(args.persona))[0]
+    )
+    persona_sha = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+    system_msg = {"role": "system", "content": persona.get("content", "")}
+
+    out_path = args.out or os.path.join(EVAL_DIR, f"{persona_id}-{args.model}.jsonl")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    done = _eval_done(out_path, persona_sha, args.model)
+    print(
+        f"🧪 'eval' 모드 실행... {persona_id} × {args.model}"
+        f" (동시 {args.concurrency}, 이미 완료 {len(done)}건)"
+    )
+
+    limiter = RateLimiter(args.rps)
+    use_cache = not args.no_cache
+    extra = {"persona": persona_id, "persona_sha": persona_sha, "model": args.model}
+    stats = {"total": 0, "errors": 0, "latencies": []}
+    started = time.perf_counter()
+
+    def record(f_out, fut):
+        row = dict(fut.result(), **extra)
+        f_out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        f_out.flush()
+        stats["total"] += 1
+        stats["errors"] += row["error"]
+        stats["latencies"].append(row["latency_ms"])
+        if stats["total"] % 50 == 0:
+            print(f"  ... {stats['total']}건 완료")
+
+    cases = (
+        c
+        for c in iter_user_turns(include_archive=not args.no_archive)
+        if c["case_id"] not in done
+    )
+    executor = ThreadPoolExecutor(max_workers=args.concurrency)
+    pending = set()
+    try:
+        with open(out_path, "a", encoding="utf-8") as f_out:
+            for i, case in enumerate(cases):
+                if args.limit and i >= args.limit:
+                    break
+                # 대기 중인 작업 수를 제한해 코퍼스 전체를 한꺼번에 올리지 않는다
+                if len(pending) >= args.concurrency * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        record(f_out, fut)
+                pending.add(
+                    executor.submit(
+                        _eval_case, case, system_msg, args.model, limiter, use_cache
+                    )
+                )
+            for fut in wait(pending)[0]:
+                record(f_out, fut)
+    except KeyboardInterrupt:
+        print("\n⏸️ 중단됨. 같은 명령으로 다시 실행하면 이어서 진행합니다.")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    latencies = sorted(stats["latencies"])
+    elapsed = time.perf_counter() - started
+    summary = f"✅ {stats['total']}건 실행 (오류 {stats['errors']}건, {elapsed:.1f}s)"
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        summary += f", 지연 p50 {p50:.0f}ms / p95 {p95:.0f}ms"
+    summary += f"\n결과: {out_path}"
+    if args.parquet:
+        parquet_path = _write_parquet(out_path)
+        if parquet_path:
+            summary += f"\nParquet: {parquet_path}"
+    return summary
+
+
+JUDGE_SYSTEM_PROMPT = """
+당신은 육아 상담 챗봇의 답변을 채점하는 평가자입니다.
+[평가 기준]을 얼마나 잘 지켰는지, 그리고 [사용자 질문]에 정확하고 안전하며 공감 있게 답했는지를
+1~10점으로 평가하세요. 마지막 줄에 반드시 '점수: N' 형식으로 점수만 적으세요.
+"""
+
+
+def _strip_fence(text):
+    """모델이 코드 블록(```yaml ... ```)으로 감싸 보낸 수정안에서 본문만 꺼냅니다."""
+    m = re.match(r"^\s*```[\w-]*\n(.*?)\n```\s*$", text, re.S)
+    return m.group(1) if m else text
+
+
+def _save_proposal(persona_dir, content):
+    """수정안을 내용 해시 이름(<sha>.yml)으로 저장합니다. 같은 내용은 한 파일만 남는다."""
+    sha = hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+    path = os.path.join(persona_dir, f"{sha}.yml")
+    if not os.path.exists(path):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp, path)
+    return sha, path
+
+
+def _batch_candidate(goal, model_name, original_content, persona_dir, limiter):
+    """목표 하나 × 모델 하나로 수정안을 만들어 저장하고 후보 정보를 반환합니다."""
+    candidate = {"goal": goal, "model": model_name, "sha": None, "error": None}
+    limiter.wait()
+    # 후보마다 만든 모델이 기록되므로 다른 모델로 대체하지 않는다
+    content = _strip_fence(
+        call_llm_by_name(
+            model_name, _propose_messages(goal, original_content), fallback=False
+        )
+    )
+    if _is_failed(content):
+        return dict(candidate, error=content)
+    try:
+        persona = yaml.safe_load(content)
+    except yaml.YAMLError as e:
+        return dict(candidate, error=f"YAML 형식 오류: {e}")
+    if not isinstance(persona, dict) or not persona.get("content"):
+        return dict(candidate, error="수정안에 content 항목이 없습니다.")
+    sha, path = _save_proposal(persona_dir, content)
+    return dict(candidate, sha=sha, path=path, system=persona["content"])
+
+
+def stub_judge(case, answer, criteria):
+    """API 없이 쓰는 결정적 채점기 (0~1). 길이/형식/질문 단어 반영 정도만 보는 대략적 기준"""
+    if _is_failed(answer) or not answer.strip():
+        return 0.0
+    score = 0.4
+    if 150 <= len(answer) <= 1500:
+        score += 0.3
+    elif len(answer) >= 50:
+        score += 0.15
+    if re.search(r"^\s*(?:[-*•]|\d+\.|#)", answer, re.M):
+        score += 0.2  # 목록/제목으로 정리된 답
+    words = set(re.findall(r"\w{2,}", case["input"]))
+    if words:
+        hit = sum(w in answer for w in words) / len(words)
+        score += 0.1 * min(1.0, hit * 2)
+    return round(min(score, 1.0), 3)
+
+
+def llm_judge(judge_model):
+    """judge_model에게 1~10점을 받아 0~1로 바꾸는 채점기. 점수를 못 읽으면 None"""
+
+    def judge(case, answer, criteria):
+        if _is_failed(answer):
+            return 0.0
+        messages = [
+            {"role": "system", "content": JUDGE_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": f"[평가 기준]\n{criteria}\n\n[사용자 질문]\n"
+                f"{case['input']}\n\n[답변]\n{answer}",
+            },
+        ]
+        reply = get_completion(judge_model, messages, fallback=False)
+        m = re.search(r"점수\s*[:：]\s*(\d+(?:\.\d+)?)", reply)
+        return min(float(m.group(1)), 10.0) / 10 if m else None
+
+    return judge
+
+
+def _batch_score(candidate, case, answer_model, judge, criteria, limiter):
+    """후보 페르소나로 사용자 턴 하나에 답하게 하고 채점합니다."""
+    limiter.wait()
+    messages = [
+        {"role": "system", "content": candidate["system"]},
+        {"role": "user", "content": case["input"]},
+    ]
+    try:
+        answer = get_completion(answer_model, messages, fallback=False)
+        score = judge(case, answer, criteria)
+    except Exception as e:
+        answer, score = f"오류: {e}", None
+    return {
+        "sha": candidate["sha"],
+        "case_id": case["case_id"],
+        "score": score,
+        "error": _is_failed(answer),
+    }
+
+
+def _ranking_markdown(run):
+    lines = [
+        f"# 수정안 순위: {run['persona']} ({run['created_at']})",
+        "",
+        f"답변 모델 {run['answer_model']} · 채점 {run['judge']}"
+        f" · 사용자 턴 {len(run['cases'])}개",
+        "",
+        "| 순위 | 후보 | 점수 | 채점 | 오류 | 목표 / 모델 | 파일 |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for i, row in enumerate(run["ranking"], 1):
+        score = "-" if row["score"] is None else f"{row['score']:.3f}"
+        sources = "<br>".join(f"{g} / {m}" for g, m in row["sources"])
+        lines.append(
+            f"| {i} | {row['sha']} | {score} | {row['scored']} | {row['errors']}"
+            f" | {sources} | {row['path']} |"
+        )
+    failed = [c for c in run["candidates"] if c["error"]]
+    if failed:
+        lines += ["", "## 만들지 못한 후보", ""]
+        lines += [f"- {c['goal']} / {c['model']}: {c['error']}" for c in failed]
+    return "\n".join(lines) + "\n"
 
-    # 최종 보고서 출력
-    print("\n" + "=" * 20 + " 토론 완료 " + "=" * 20)
-    print(final_report)
-    print("=" * 52)
+
+def handle_propose_batch_mode(args):
+    """'propose-batch' 모드. 여러 목표 × 모델로 수정안을 동시에 만들고 자동으로 순위를 매깁니다.
+
+    1. 목표×모델 조합마다 수정안을 만들어 data/proposals/<페르소나 id>/<sha>.yml 에 저장
+    2. 저장된 사용자 턴 앞에서부터 --cases개를 원본과 각 후보로 다시 답하게 하고 채점
+    3. 평균 점수 순위를 runs/<시각>-<임의 8자리>.json / .md 로 남김
+    """
+    goals = list(args.goal or [])
+    if args.goals_file:
+        with open(args.goals_file, "r", encoding="utf-8") as f:
+            goals += [line.strip() for line in f if line.strip()]
+    if not goals:
+        return "❌ 오류: --goal 또는 --goals-file로 수정 목표를 하나 이상 지정하세요."
+    try:
+        with open(args.target, "r", encoding="utf-8") as f:
+            original_content = f.read()
+    except FileNotFoundError:
+        return f"❌ 오류: 대상 파일을 찾을 수 없습니다 -> {args.target}"
+    persona = yaml.safe_load(original_content) or {}
+    persona_id = persona.get("id") or os.path.splitext(os.path.basename(args.target))[0]
+    persona_dir = os.path.join(args.out_dir or PROPOSALS_DIR, persona_id)
+    os.makedirs(os.path.join(persona_dir, "runs"), exist_ok=True)
+
+    cases = list(
+        itertools.islice(
+            iter_user_turns(include_archive=not args.no_archive), args.cases
+        )
+    )
+    if not cases:
+        return "❌ 오류: 채점에 쓸 저장된 사용자 턴이 없습니다."
+    print(
+        f"🧬 'propose-batch' 모드 실행... 목표 {len(goals)}개 × 모델"
+        f" {len(args.models)}개, 사용자 턴 {len(cases)}개로 채점"
+    )
+    started = time.perf_counter()
+
+    # --- 1. 수정안 후보 생성 (채점과 같은 동시 호출 수/초당 호출 제한) ---
+    combos = [(g, m) for g in goals for m in args.models]
+    limiter = RateLimiter(args.rps)
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        candidates = list(
+            executor.map(
+                lambda gm: _batch_candidate(
+                    *gm, original_content, persona_dir, limiter
+                ),
+                combos,
+            )
+        )
+    baseline = {
+        "goal": "(원본)",
+        "model": "-",
+        "sha": hashlib.sha256(original_content.encode("utf-8")).hexdigest()[:12],
+        "path": args.target,
+        "system": persona.get("content", ""),
+        "error": None,
+    }
+    # 내용이 같은 후보는 한 번만 채점한다
+    unique = {c["sha"]: c for c in [baseline] + candidates if c["sha"]}
+    failed = sum(bool(c["error"]) for c in candidates)
+    print(f"  후보 {len(unique) - 1}개 생성 (실패 {failed}개)")
+
+    # --- 2. 사용자 턴 재생 + 채점 ---
+    judge = stub_judge if args.judge == "stub" else llm_judge(args.judge)
+    criteria = "\n".join(f"- {g}" for g in goals)
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [
+            executor.submit(
+                _batch_score, c, case, args.answer_model, judge, criteria, limiter
+            )
+            for c in unique.values()
+            for case in cases
+        ]
+        rows = [fut.result() for fut in futures]
+
+    # --- 3. 순위 ---
+    ranking = []
+    for sha, c in unique.items():
+        scores = [
+            r["score"] for r in rows if r["sha"] == sha and r["score"] is not None
+        ]
+        ranking.append(
+            {
+                "sha": sha,
+                "score": round(sum(scores) / len(scores), 4) if scores else None,
+                "scored": len(scores),
+                "errors": sum(r["error"] for r in rows if r["sha"] == sha),
+                "sources": [
+                    (x["goal"], x["model"])
+                    for x in [baseline] + candidates
+                    if x["sha"] == sha
+                ],
+                "path": c["path"],
+            }
+        )
+    ranking.sort(key=lambda r: (r["score"] is None, -(r["score"] or 0), r["errors"]))
+
+    created_at = time.strftime("%Y%m%d-%H%M%S")
+    run = {
+        "persona": persona_id,
+        "target": args.target,
+        "created_at": created_at,
+        "goals": goals,
+        "models": args.models,
+        "answer_model": args.answer_model,
+        "judge": args.judge,
+        "cases": [c["case_id"] for c in cases],
+        "candidates": [
+            {k: v for k, v in c.items() if k != "system"} for c in candidates
+        ],
+        "ranking": ranking,
+        "scores": rows,
+    }
+    # 같은 초에 여러 번 돌려도 겹치지 않도록 임의 접미사
+    run_name = f"{created_at}-{uuid.uuid4().hex[:8]}"
+    run_path = os.path.join(persona_dir, "runs", f"{run_name}.json")
+    with open(run_path, "w", encoding="utf-8") as f:
+        json.dump(run, f, ensure_ascii=False, indent=2)
+    md_path = os.path.splitext(run_path)[0] + ".md"
+    with open(md_path, "w", encoding="utf-8") as f:
+        f.write(_ranking_markdown(run))
+
+    elapsed = time.perf_counter() - started
+    lines = [f"✅ 후보 {len(unique) - 1}개 채점 완료 ({elapsed:.1f}s)"]
+    for i, row in enumerate(ranking, 1):
+        score = "-" if row["score"] is None else f"{row['score']:.3f}"
+        label = ", ".join(f"{g} / {m}" for g, m in row["sources"])
+        lines.append(f"  {i}. {row['sha']} {score}  {label}")
+    lines.append(f"순위: {md_path}")
+    return "\n".join(lines)
 
 
 def main_cli():
@@ -216,11 +760,96 @@ def main_cli():
         required=True,
         help="토론에 참여할 모델 목록 (공백으로 구분)",
     )
+    parser_debate.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_MODEL_TIMEOUT,
+        help="단계별로 모델 하나를 기다리는 최대 시간(초). 넘으면 해당 모델만 제외",
+    )
     parser_debate.set_defaults(func=handle_debate_mode)
 
+    # --- 'eval' 모드 설정 ---
+    parser_eval = subparsers.add_parser(
+        "eval", help="저장된 대화의 사용자 턴을 페르소나로 다시 실행해 결과를 모읍니다."
+    )
+    parser_eval.add_argument("--persona", type=str, required=True)
+    parser_eval.add_argument(
+        "--model",
+        type=str,
+        default="gpt-4o-mini",
+        help="사용할 LLM 모델 (오프라인 테스트는 fake)",
+    )
+    parser_eval.add_argument(
+        "--out", type=str, default=None, help="결과 JSONL 경로 (기본: data/eval/)"
+    )
+    parser_eval.add_argument("--concurrency", type=int, default=4, help="동시 호출 수")
+    parser_eval.add_argument(
+        "--rps", type=float, default=0, help="초당 최대 호출 수 (0=제한 없음)"
+    )
+    parser_eval.add_argument(
+        "--limit", type=int, default=0, help="이번 실행에서 처리할 최대 턴 수"
+    )
+    parser_eval.add_argument(
+        "--no-archive", action="store_true", help="data/archive/*.json 은 건너뜀"
+    )
+    parser_eval.add_argument(
+        "--no-cache", action="store_true", help="응답 캐시를 쓰지 않고 매번 호출"
+    )
+    parser_eval.add_argument(
+        "--parquet", action="store_true", help="끝나면 같은 이름의 .parquet도 저장"
+    )
+    parser_eval.set_defaults(func=handle_eval_mode)
+
+    # --- 'propose-batch' 모드 설정 ---
+    parser_batch = subparsers.add_parser(
+        "propose-batch",
+        help="여러 목표×모델로 수정안을 동시에 만들고 저장된 사용자 턴으로 채점합니다.",
+    )
+    parser_batch.add_argument("--target", type=str, required=True)
+    parser_batch.add_argument(
+        "--goal", action="append", default=None, help="수정 목표 (여러 번 지정 가능)"
+    )
+    parser_batch.add_argument(
+        "--goals-file", type=str, default=None, help="한 줄에 목표 하나인 파일"
+    )
+    parser_batch.add_argument(
+        "--models", nargs="+", default=["gpt-4o-mini"], help="수정안을 만들 모델 목록"
+    )
+    parser_batch.add_argument(
+        "--answer-model",
+        type=str,
+        default="gpt-4o-mini",
+        help="후보 페르소나로 사용자 턴에 답할 모델 (오프라인 테스트는 fake)",
+    )
+    parser_batch.add_argument(
+        "--judge",
+        type=str,
+        default="stub",
+        help="채점 모델 이름. stub이면 API 없이 결정적 규칙으로 채점",
+    )
+    parser_batch.add_argument(
+        "--cases", type=int, default=20, help="채점에 쓸 사용자 턴 수 (앞에서부터)"
+    )
+    parser_batch.add_argument("--concurrency", type=int, default=4, help="동시 호출 수")
+    parser_batch.add_argument(
+        "--rps", type=float, default=0, help="초당 최대 호출 수 (0=제한 없음)"
+    )
+    parser_batch.add_argument(
+        "--out-dir", type=str, default=None, help="저장 위치 (기본: data/proposals/)"
+    )
+    parser_batch.add_argument(
+        "--no-archive", action="store_true", help="data/archive/*.json 은 건너뜀"
+    )
+    parser_batch.set_defaults(func=handle_propose_batch_mode)
+
     args = parser.parse_args()
 
     result = args.func(args)
+    if args.mode in ("eval", "propose-batch"):
+        print(result)
+    if args.mode == "debate":
+        print(result["report"])
+        print("=" * 52)
     if args.mode in ["debug", "propose"]:
         print("\n" + "=" * 20 + " 결과 " + "=" * 20)
         if args.mode == "propose":
@@ -0,0 +1,134 @@
+# scripts/bench_router.py
+# select_prompt_id 마이크로 벤치마크.
+# data/conversations 와 data/archive 의 저장된 대화를 app.py와 같은 방식(최근 메시지 6개 중
+# 사용자 메시지를 히스토리로)으로 재생하면서, 예전 정규식 라우터와 새 키워드 라우터를 비교합니다.
+# --semantic 이면 예문 임베딩 라우터(lib/semantic_router.py, numpy 필요)도 함께 잰다.
+#
+#   python scripts/bench_router.py [--repeat 5] [--semantic]
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+# --- 'lib' 디렉터리의 모듈을 가져오기 위한 경로 설정 ---
+webapp_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(webapp_root)
+
+from lib import file_storage  # noqa: E402
+from lib.prompt_manager import get_prompts, get_router  # noqa: E402
+
+# --- 비교용: 예전 lib/prompt_manager.py 의 정규식 라우터 ---
+_EMERGENCY = r"(응급|119|ER|호흡곤란|무호흡|청색증|탈수|경련|의식\s*소실|심한\s*구토|피\s*섞인\s*변|35(\.\d+)?°?이하|40(\.\d+)?°?이상)"
+_SOOTHING_POS = (
+    r"(위로|격려|지쳐|힘들|버거워|자책|불안|좌절|멘탈|울컥|토닥|감정\s*정리)"
+)
+_INFO_POS = r"(모유|분유|수유|수면|낮잠|밤중수유|스케줄|계획|발진|아토피|체온|예방접종|변\s*색|트림|토|\b개월\b|\b주차\b|가이드|권고|루틴|졸업|스트랩|쪽쪽이)"
+
+
+def legacy_select_prompt_id(user_text, history_text="", last_route=None):
+    text = f"{history_text}\n{user_text}".lower()
+    if re.search(_EMERGENCY, text, flags=re.IGNORECASE):
+        return "parenting_expert_v1"
+    s_score = len(re.findall(_SOOTHING_POS, text, flags=re.IGNORECASE))
+    i_score = len(re.findall(_INFO_POS, text, flags=re.IGNORECASE))
+    if i_score - s_score >= 1:
+        return "parenting_expert_v1"
+    if s_score - i_score >= 1:
+        return "soothing_expert_v1"
+    return last_route or "parenting_expert_v1"
+
+
+# 저장된 대화가 없을 때 쓰는 예시 입력
+_SAMPLE = [
+    "[아기 3개월]\n밤중수유 간격이 너무 짧아요. 낮잠 루틴도 궁금해요",
+    "[아기 3개월]\n요즘 너무 지쳐서 울컥해요. 제가 잘하고 있는 걸까요",
+    "[아기 5개월]\n체온이 38도인데 해열제 먹여도 되나요",
+    "[아기 2개월]\n분유 먹고 토를 자주 해요",
+    "[아기 7개월]\n아기가 경련을 해요 어떻게 해야 하나요",
+]
+
+
+def load_corpus():
+    """[[사용자 메시지, ...], ...] 형태로 대화별 사용자 턴을 모읍니다."""
+    corpus = []
+    paths = glob.glob(os.path.join(file_storage.CONV_DIR, "*.json*"))
+    cids = {
+        os.path.splitext(os.path.basename(p))[0]
+        for p in paths
+        if os.path.basename(p) != "index.json" and not p.endswith(".tmp")
+    }
+    for cid in sorted(cids):
+        corpus.append(file_storage.load_conversation(cid))
+    archive_dir = os.path.join(file_storage.DATA_DIR, "archive")
+    for path in sorted(glob.glob(os.path.join(archive_dir, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            corpus.append(json.load(f))
+    turns = [
+        [m.get("content", "") for m in msgs if m.get("role") == "user"]
+        for msgs in corpus
+    ]
+    return [t for t in turns if t]
+
+
+def replay(select, conversations):
+    """app.py와 같은 방식으로 라우팅하고 (선택 결과 목록, 호출 수)를 반환"""
+    routes = []
+    for user_turns in conversations:
+        last_route = None
+        for i, user_text in enumerate(user_turns):
+            # 최근 6개 메시지(사용자/답변 교대) 중 사용자 메시지 = 최근 사용자 턴 3개
+            hist = "\n".join(user_turns[max(0, i - 2) : i + 1])
+            last_route = select(user_text, hist, last_route=last_route)
+            routes.append(last_route)
+    return routes
+
+
+def bench(select, conversations, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        routes = replay(select, conversations)
+        best = min(best, time.perf_counter() - t0)
+    return best, routes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="select_prompt_id 벤치마크")
+    parser.add_argument("--repeat", type=int, default=5, help="반복 횟수 (최소값 사용)")
+    parser.add_argument(
+        "--semantic", action="store_true", help="시맨틱 라우터도 측정 (numpy 필요)"
+    )
+    args = parser.parse_args()
+
+    conversations = load_corpus()
+    source = "저장된 대화"
+    if not conversations:
+        conversations = [_SAMPLE] * 20
+        source = "예시 입력(저장된 대화 없음)"
+    n_calls = sum(len(t) for t in conversations)
+    print(f"코퍼스: {source}, 대화 {len(conversations)}개, 라우팅 호출 {n_calls}회")
+
+    router = get_router()
+    t_old, r_old = bench(legacy_select_prompt_id, conversations, args.repeat)
+    t_new, r_new = bench(router.select, conversations, args.repeat)
+
+    agree = sum(a == b for a, b in zip(r_old, r_new))
+    print(f"legacy regex : {t_old / n_calls * 1e6:8.1f} µs/호출")
+    print(f"keyword rt   : {t_new / n_calls * 1e6:8.1f} µs/호출")
+    print(f"선택 일치율   : {agree}/{n_calls}")
+
+    if args.semantic:
+        from lib.semantic_router import SemanticRouter
+
+        semantic = SemanticRouter(get_prompts())
+        t_sem, r_sem = bench(semantic.select, conversations, args.repeat)
+        agree = sum(a == b for a, b in zip(r_new, r_sem))
+        print(f"semantic rt  : {t_sem / n_calls * 1e6:8.1f} µs/호출")
+        print(f"키워드와 일치 : {agree}/{n_calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# scripts/build_search_index.py
+# 기존 대화와 data/archive/*.json 을 검색 인덱스(data/search_index.db)에 색인합니다.
+# 이후에는 저장/내보내기 때마다 자동으로 갱신되므로 처음 한 번(또는 인덱스를 지운 뒤)만
+# 실행하면 됩니다. 이미 색인된 대화는 건너뛰므로 여러 번 실행해도 안전합니다.
+#
+#   python scripts/build_search_index.py [--no-archive]
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+# --- 'lib' 디렉터리의 모듈을 가져오기 위한 경로 설정 ---
+webapp_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(webapp_root)
+
+from lib import search_index  # noqa: E402
+from lib.storage import list_conversations, load_conversation  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="대화 전문 검색 인덱스 생성")
+    parser.add_argument(
+        "--no-archive", action="store_true", help="data/archive/*.json 은 건너뜀"
+    )
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    count = 0
+    for c in list_conversations():
+        search_index.update_conversation(c["id"], load_conversation(c["id"]))
+        count += 1
+
+    if not args.no_archive:
+        archive_dir = os.path.join(search_index.DATA_DIR, "archive")
+        for path in sorted(glob.glob(os.path.join(archive_dir, "*.json"))):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    messages = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"건너뜀: {path} ({e})")
+                continue
+            if isinstance(messages, list):
+                search_index.index_archive(path, messages)
+                count += 1
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {count}개 대화 색인 완료 ({elapsed:.2f}s) -> {search_index.INDEX_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# scripts/export_conversations.py
+# 전체(또는 조건에 맞는) 대화를 파일 하나로 내보냅니다. (야간 스냅샷 등)
+# 메시지를 한 건씩 흘려 쓰므로 데이터가 커도 메모리를 거의 쓰지 않습니다. (lib/export.py)
+#
+#   python scripts/export_conversations.py          # data/exports/*.tar.gz
+#   python scripts/export_conversations.py --format jsonl.gz --since "2025-09-01"
+#   python scripts/export_conversations.py --cid 3f2a9c1d0b7e --cid 9a8b7c6d5e4f
+import argparse
+import os
+import sys
+import time
+
+# --- 'lib' 디렉터리의 모듈을 가져오기 위한 경로 설정 ---
+webapp_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(webapp_root)
+
+from lib.export import EXPORT_DIR, FORMATS  # noqa: E402
+from lib.storage import export_conversations  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="대화 일괄 내보내기")
+    parser.add_argument("--format", choices=FORMATS, default="tar.gz")
+    parser.add_argument(
+        "--out-dir", type=str, default=None, help=f"저장 위치 (기본: {EXPORT_DIR})"
+    )
+    parser.add_argument(
+        "--since", type=str, default=None, help="이 시각 이후 수정된 대화 (YYYY-MM-DD)"
+    )
+    parser.add_argument(
+        "--until", type=str, default=None, help="이 시각 전에 수정된 대화 (YYYY-MM-DD)"
+    )
+    parser.add_argument("--title", type=str, default=None, help="제목에 포함된 문자열")
+    parser.add_argument(
+        "--cid", action="append", default=None, help="대화 id (여러 번 지정 가능)"
+    )
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    path, count = export_conversations(
+        fmt=args.format,
+        export_dir=args.out_dir,
+        since=args.since,
+        until=args.until,
+        title=args.title,
+        cids=args.cid,
+    )
+    elapsed = time.perf_counter() - started
+    print(f"✅ {count}개 대화 내보내기 완료 ({elapsed:.2f}s) -> {path}")
+
+
+if __name__ == "__main__":
+    main()
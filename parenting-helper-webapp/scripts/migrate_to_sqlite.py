@@ -0,0 +1,90 @@
+# scripts/migrate_to_sqlite.py
+# 파일 백엔드(data/conversations, data/archive)의 대화를 SQLite 백엔드로 옮깁니다.
+# 같은 id는 덮어쓰므로 여러 번 실행해도 결과가 같습니다.
+#
+#   python scripts/migrate_to_sqlite.py [--db data/conversations.db] [--no-archive]
+#   이후 STORAGE_BACKEND=sqlite 로 앱 실행
+import argparse
+import datetime
+import glob
+import json
+import os
+import sys
+
+# --- 'lib' 디렉터리의 모듈을 가져오기 위한 경로 설정 ---
+webapp_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(webapp_root)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="파일 대화 저장소 → SQLite 마이그레이션"
+    )
+    parser.add_argument(
+        "--db", type=str, default=None, help="SQLite 경로 (기본: data/conversations.db)"
+    )
+    parser.add_argument(
+        "--no-archive", action="store_true", help="data/archive/*.json 은 건너뜀"
+    )
+    args = parser.parse_args()
+
+    if args.db:
+        os.environ["STORAGE_SQLITE_PATH"] = args.db
+
+    # 경로 환경 변수를 반영한 뒤 import 해야 합니다.
+    from lib import file_storage, search_index, sqlite_storage
+
+    # 1) 활성 대화: index.json의 메타데이터 + 대화 파일(.json / .jsonl)
+    metas = {c["id"]: c for c in file_storage.list_conversations()}
+    on_disk = {
+        os.path.splitext(os.path.basename(p))[0]
+        for p in glob.glob(os.path.join(file_storage.CONV_DIR, "*.json*"))
+        if os.path.basename(p) != "index.json" and not p.endswith(".tmp")
+    }
+    n_conv = 0
+    for cid in sorted(set(metas) | on_disk):
+        meta = metas.get(cid, {})
+        sqlite_storage.import_conversation(
+            cid,
+            meta.get("title", "새 대화"),
+            file_storage.load_conversation(cid),
+            updated_at=meta.get("updated_at") or None,
+            source="conversations",
+        )
+        n_conv += 1
+
+    # 2) 아카이브: 내보내기 파일마다 보관(archived) 대화 하나로 가져옴
+    n_arch = 0
+    if not args.no_archive:
+        archive_dir = os.path.join(file_storage.DATA_DIR, "archive")
+        for path in sorted(glob.glob(os.path.join(archive_dir, "*.json"))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            # 검색 결과가 대화로 이어지도록 검색 인덱스와 같은 id (archive:<이름>)
+            cid = search_index.archive_id(path)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    msgs = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"경고: 아카이브를 읽지 못해 건너뜁니다 -> {path} ({e})")
+                continue
+            mtime = datetime.datetime.fromtimestamp(os.path.getmtime(path))
+            # 이전 버전이 archive-<이름>으로 가져온 대화는 정리
+            sqlite_storage.delete_conversation(f"archive-{name}")
+            sqlite_storage.import_conversation(
+                cid,
+                name,
+                msgs,
+                updated_at=mtime.strftime("%Y-%m-%d %H:%M:%S"),
+                archived=True,
+                source=os.path.relpath(path, webapp_root),
+            )
+            n_arch += 1
+
+    print(
+        f"✅ 마이그레이션 완료: 대화 {n_conv}개, 아카이브 {n_arch}개"
+        f" -> {sqlite_storage.DB_PATH}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# tests/test_write_behind.py
+# 삭제 순서(discard → flush → delete) 동안 쓰는 중이던 저장이 대화를 되살리지 않는지 확인합니다.
+#
+#   python -m pytest tests
+import os
+import sys
+import threading
+
+import pytest
+
+# --- 'lib' 디렉터리의 모듈을 가져오기 위한 경로 설정 ---
+webapp_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(webapp_root)
+
+from lib import write_behind  # noqa: E402
+
+
+@pytest.fixture
+def disk(monkeypatch):
+    """storage 대신 쓰는 메모리 저장소. save_conversation은 release가 set될 때까지 멈춤"""
+    saved = {}
+    started, release = threading.Event(), threading.Event()
+
+    def slow_save(cid, messages):
+        started.set()
+        assert release.wait(5)
+        saved[cid] = messages
+
+    monkeypatch.setattr(write_behind, "ENABLED", True)
+    monkeypatch.setattr(write_behind.storage, "save_conversation", slow_save)
+    yield saved, started, release
+    release.set()
+    assert write_behind.flush(5)
+
+
+def test_delete_after_discard_waits_for_in_flight_write(disk):
+    saved, started, release = disk
+    write_behind.save_conversation("c1", [{"role": "user", "content": "안녕"}])
+    assert started.wait(5)  # 작업 스레드가 쓰기 시작함
+
+    write_behind.discard("c1")
+    # 쓰는 중인 저장이 끝나기 전에는 flush가 끝나지 않아야 한다
+    assert not write_behind.flush(0.2)
+
+    release.set()
+    assert write_behind.flush(5)
+    saved.pop("c1", None)  # delete_conversation
+
+    assert write_behind.flush(1)
+    assert "c1" not in saved
+    assert write_behind.pending() == 0
+
+
+def test_discard_before_write_starts(disk):
+    saved, started, release = disk
+    write_behind.save_conversation("busy", [{"role": "user", "content": "1"}])
+    assert started.wait(5)
+    # 작업 스레드가 busy를 쓰는 동안 큐에만 들어간 c2는 취소되면 쓰이지 않는다
+    write_behind.save_conversation("c2", [{"role": "user", "content": "2"}])
+    write_behind.discard("c2")
+
+    release.set()
+    assert write_behind.flush(5)
+    assert "c2" not in saved
+    assert "busy" in saved